@@ -1,14 +1,22 @@
 import os
+from django.conf import settings
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import tracker.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bugtracker.settings')
 
+# Set up Django before importing consumers, which import models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from common.asgi import ConcurrencyLimit  # noqa: E402
+import tracker.routing  # noqa: E402
+
 application = ProtocolTypeRouter(
     {
-        "http": get_asgi_application(),
+        "http": ConcurrencyLimit(
+            django_asgi_app, settings.HTTP_MAX_CONCURRENT_REQUESTS
+        ),
         "websocket": AuthMiddlewareStack(
             URLRouter(tracker.routing.websocket_urlpatterns)
         ),
@@ -0,0 +1,50 @@
+"""
+Daphne entry point that negotiates permessage-deflate with WebSocket clients.
+
+Daphne doesn't enable WebSocket compression on its own. Run the server
+through this module instead of the daphne script:
+
+    python -m bugtracker.server -b 0.0.0.0 -p 8000 bugtracker.asgi:application
+
+Set WEBSOCKET_PERMESSAGE_DEFLATE=0 to turn compression off again.
+"""
+
+import os
+
+from autobahn.websocket.compress import (
+    PerMessageDeflateOffer,
+    PerMessageDeflateOfferAccept,
+)
+from daphne.cli import CommandLineInterface
+from daphne.server import Server
+
+
+def accept_permessage_deflate(offers):
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+    return None
+
+
+class CompressingServer(Server):
+    @property
+    def ws_factory(self):
+        return self._ws_factory
+
+    @ws_factory.setter
+    def ws_factory(self, factory):
+        # Server.run() creates the factory and configures it right away, so
+        # hook the assignment rather than copying run().
+        if os.environ.get("WEBSOCKET_PERMESSAGE_DEFLATE", "1") != "0":
+            factory.setProtocolOptions(
+                perMessageCompressionAccept=accept_permessage_deflate
+            )
+        self._ws_factory = factory
+
+
+class CompressingCommandLineInterface(CommandLineInterface):
+    server_class = CompressingServer
+
+
+if __name__ == "__main__":
+    CompressingCommandLineInterface.entrypoint()
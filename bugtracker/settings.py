@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,11 +49,15 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "django_filters",
     # Local apps
+    "common",
     "core",
     "tracker",
 ]
 
 MIDDLEWARE = [
+    "common.middleware.MetricsMiddleware",
+    "common.middleware.QueryLogMiddleware",
+    "common.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -93,16 +100,101 @@ DATABASES = {
     }
 }
 
+# Django runs each HTTP request in its own ThreadSensitiveContext, so every
+# request in flight gets a thread of its own and holds a database connection,
+# whatever the executor size. The ASGI app lets at most this many requests in
+# at once per process (common.asgi.ConcurrencyLimit); the rest wait on the
+# event loop. The pool adds room for the WebSocket consumers' shared sync
+# thread and the background writers.
+HTTP_MAX_CONCURRENT_REQUESTS = int(os.environ.get("HTTP_MAX_CONCURRENT_REQUESTS", 32))
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2))
+DATABASE_POOL_MAX_SIZE = int(
+    os.environ.get("DATABASE_POOL_MAX_SIZE", HTTP_MAX_CONCURRENT_REQUESTS + 4)
+)
+# Seconds a thread waits for a pooled connection before the request fails
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 10))
+
+# Postgres uses Django's native connection pool (requires psycopg[pool]).
+# Pooling replaces persistent connections, so CONN_MAX_AGE stays at 0, and
+# CONN_HEALTH_CHECKS makes the pool check connections before handing them
+# out. SQLite has neither, so the checks are only set here.
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", "127.0.0.1"),
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pool": {
+                "min_size": DATABASE_POOL_MIN_SIZE,
+                "max_size": DATABASE_POOL_MAX_SIZE,
+                "timeout": DATABASE_POOL_TIMEOUT,
+                "max_idle": 300,
+            },
+        },
+    }
+
+# Optional read replica for list and analytics traffic. Locally a second
+# SQLite file works as a stand-in, e.g. DATABASE_REPLICA_NAME=db_replica.sqlite3
+if os.environ.get("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ["POSTGRES_REPLICA_HOST"],
+        "TEST": {"MIRROR": "default"},
+    }
+elif os.environ.get("DATABASE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.environ["DATABASE_REPLICA_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["common.db_routing.PrimaryReplicaRouter"]
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+# Replicas further behind than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_INTERVAL = 2
+# Clients read from the primary for this long after a successful write
+REPLICA_STICKY_SECONDS = 5
+
+# Cache
+# Replica pins, WebSocket connection counts and unread notification counts
+# are kept here and have to be seen by every process, so deployments need
+# Redis ("manage.py check --deploy" fails without it). The local-memory
+# fallback is per process and only suits a single development server.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 # Django REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
         "rest_framework.authentication.TokenAuthentication",
+        # Sub-requests of /api/batch/ reuse the batch's authentication
+        "common.batch.BatchAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_THROTTLE_CLASSES": [
+        "common.rate_limit.PlanRateThrottle",
+    ],
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted.
+    # 0 uses REMOTE_ADDR, so clients can't pick their own rate limit bucket.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+    "DEFAULT_SCHEMA_CLASS": "common.schema.DeferredAutoSchema",
 }
 
 # JWT Settings
@@ -113,20 +205,153 @@ SIMPLE_JWT = {
 }
 
 # Channels
+# Comma-separated redis:// URLs. Project groups are spread over them by
+# consistent hashing, see common.channel_layers.
+CHANNEL_REDIS_HOSTS = [
+    host for host in os.environ.get("CHANNEL_REDIS_HOSTS", "").split(",") if host
+] or [("127.0.0.1", 6379)]
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "common.channel_layers.ShardedRedisChannelLayer",
         "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],
+            "hosts": CHANNEL_REDIS_HOSTS,
         },
     },
 }
 
+# Metrics
+# Scrapers must send "Authorization: Bearer <token>" when this is set
+METRICS_AUTH_TOKEN = os.environ.get("METRICS_AUTH_TOKEN")
+
+# Profiling and query logging
+# Requests sending "X-Profile: <PROFILING_TOKEN>" are profiled, as is a random
+# PROFILING_SAMPLE_RATE share of all requests.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = BASE_DIR / "profiles"
+SLOW_QUERY_THRESHOLD_MS = 200
+# Identical SQL run this many times in one request is logged as a likely N+1
+REPEATED_QUERY_THRESHOLD = 10
+
+# WebSocket backpressure
+# Events queued per connection before the overflow policies apply. In order:
+# "coalesce" merges queued bug_update events for the same bug, "drop_typing"
+# evicts typing indicators and "disconnect" closes slow clients with a
+# resync_required hint.
+WEBSOCKET_OUTBOX_SIZE = 256
+WEBSOCKET_OUTBOX_POLICIES = ["coalesce", "drop_typing", "disconnect"]
+# Bytes a client may have unacknowledged before events wait in its outbox;
+# clients acknowledge by answering each ping with {"type": "pong", "id": ...}
+WEBSOCKET_SEND_WINDOW = 1024 * 1024
+
+# WebSocket liveness and limits
+# The server sends {"type": "ping"} every interval; sockets that have answered
+# a ping and then send nothing for WEBSOCKET_IDLE_TIMEOUT seconds are closed.
+WEBSOCKET_HEARTBEAT_INTERVAL = 25
+WEBSOCKET_IDLE_TIMEOUT = 90
+# Re-join groups well before channels_redis' group_expiry (one day) drops them,
+# and soon enough to rebuild memberships lost with a channel layer shard
+WEBSOCKET_GROUP_REFRESH_INTERVAL = 300
+WEBSOCKET_MAX_CONNECTIONS_PER_USER = 20
+WEBSOCKET_MAX_CONNECTIONS_PER_NODE = 10000
+WEBSOCKET_CONNECTION_COUNT_TTL = WEBSOCKET_IDLE_TIMEOUT * 2
+
+# Presence
+# Sockets that miss this many seconds of heartbeats no longer count as online
+PRESENCE_TTL = WEBSOCKET_HEARTBEAT_INTERVAL * 3
+# Joins and leaves are batched into one presence_diff per project per window
+PRESENCE_DEBOUNCE_SECONDS = 2
+
+# Projects
+# Project payloads embed this many members; the full list is paginated at
+# /api/projects/{id}/members/
+PROJECT_MEMBER_PREVIEW_SIZE = 5
+# Usernames accepted by one add_member/remove_member request
+PROJECT_MEMBER_BULK_LIMIT = 1000
+
+# Sync
+# Log entries returned per /api/sync/ request, by default and at most
+SYNC_BATCH_SIZE = 500
+SYNC_MAX_BATCH_SIZE = 2000
+# compact_sync_log drops tombstones older than this; clients holding an
+# older token must reload
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Background deletion
+# Deleting a project or many bugs hides them at once; run_deletion_jobs then
+# deletes the rows this many at a time
+DELETION_BATCH_SIZE = 1000
+DELETION_JOB_POLL_INTERVAL = 5
+# A running job whose worker hasn't started or finished a batch for this long
+# is taken over by another worker; the old worker stops at its next batch
+DELETION_JOB_STALE_SECONDS = 300
+# Bugs per bulk_delete request
+DELETION_BULK_BUG_LIMIT = 5000
+
+# Rate limiting
+# Token buckets per user (per IP when anonymous), scope and route. "N/period"
+# allows bursts of N and refills N tokens per period; None is unlimited. Views
+# pick a scope with throttle_scope and fall back to "api"; WebSocket frames
+# count against "websocket". Set RATE_LIMIT_REDIS_URL to share buckets between
+# processes, otherwise each process limits on its own.
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_PLANS = {
+    "anonymous": {"api": "60/min", "registration": "10/hour"},
+    "FREE": {
+        "api": "600/min",
+        "autocomplete": "300/min",
+        "sync": "120/min",
+        "websocket": "20/s",
+    },
+    "TEAM": {
+        "api": "3000/min",
+        "autocomplete": "600/min",
+        "sync": "600/min",
+        "websocket": "50/s",
+    },
+    "ENTERPRISE": {
+        "api": "12000/min",
+        "autocomplete": "1200/min",
+        "sync": "2400/min",
+        "websocket": "100/s",
+    },
+}
+
+# Batch requests
+# GET requests per /api/batch/ call, and how many of them run at once (each
+# holds a database connection while it runs)
+BATCH_MAX_REQUESTS = 10
+BATCH_CONCURRENCY = 4
+
+# Notifications
+# Unread counts are cached per user and bumped as notifications arrive; with
+# no shared cache (CACHE_REDIS_URL) they are counted on every read instead
+NOTIFICATION_UNREAD_CACHE_SECONDS = 300
+
+# Activity log
+# Buffered mode writes activity entries from a background thread with
+# bulk_create once the request's transaction commits; pending entries are
+# journaled to ACTIVITY_LOG_JOURNAL_DIR. The journal survives process crashes;
+# set ACTIVITY_LOG_FSYNC to also survive power loss, at one fsync per entry.
+ACTIVITY_LOG_BUFFERED = os.environ.get("ACTIVITY_LOG_BUFFERED") == "1"
+ACTIVITY_LOG_BATCH_SIZE = 500
+ACTIVITY_LOG_FLUSH_INTERVAL = 1.0
+ACTIVITY_LOG_JOURNAL_DIR = BASE_DIR / "activity_journal"
+ACTIVITY_LOG_FSYNC = os.environ.get("ACTIVITY_LOG_FSYNC") == "1"
+
+# Admin
+# Changelists of large tables show the query planner's row estimate instead
+# of running COUNT(*) once it is at least this many rows (PostgreSQL only)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
 # CORS
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Browsers need these for optimistic concurrency (ETag / If-Match)
+CORS_ALLOW_HEADERS = (*default_headers, "if-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 # Spectacular settings
 SPECTACULAR_SETTINGS = {
@@ -134,7 +359,16 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "A comprehensive bug tracking system with real-time updates",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
+    "DEFAULT_GENERATOR_CLASS": "common.openapi.SchemaGenerator",
+    # Batch sub-requests aren't something clients authenticate with
+    "AUTHENTICATION_WHITELIST": [
+        cls
+        for cls in REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"]
+        if cls != "common.batch.BatchAuthentication"
+    ],
 }
+# Written by "manage.py build_schema", one file per code version and format
+SCHEMA_DIR = BASE_DIR / "schema"
 
 
 # Password validation
@@ -155,6 +389,13 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs on a small dedicated pool so registration bursts run
+# at most this many slow hashes at once. Up to PASSWORD_HASHING_MAX_WAITING
+# request threads wait for a slot; more sign-ups get a 503 straight away.
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_MAX_WAITING = 8
+PASSWORD_HASHING_TIMEOUT = 10
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -5,11 +5,9 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
 )
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
+
+from common import schema
+from common.views import metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -19,16 +17,13 @@ urlpatterns = [
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     # API Documentation
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "api/schema/swagger-ui/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
-    path(
-        "api/schema/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
-        name="redoc",
-    ),
+    # Served from the build_schema output; see common.schema
+    path("api/schema/", schema.schema, name="schema"),
+    path("api/schema/swagger-ui/", schema.swagger_ui, name="swagger-ui"),
+    path("api/schema/redoc/", schema.redoc, name="redoc"),
     path("api/auth/", include("core.rest.urls.registration")),
-]
\ No newline at end of file
+    path("api/users/", include("core.rest.urls.users")),
+    path("api/ops/", include("common.rest.urls.ops")),
+    path("api/batch/", include("common.rest.urls.batch")),
+    path("metrics", metrics, name="metrics"),
+]
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "common"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks  # noqa: F401 (registers the system checks)
+        from .db_pool import collect_pool_metrics, record_connection_created
+        from .metrics import REGISTRY
+
+        connection_created.connect(
+            record_connection_created, dispatch_uid="common.db_pool"
+        )
+        REGISTRY.register_collector(collect_pool_metrics)
@@ -0,0 +1,21 @@
+import asyncio
+
+
+class ConcurrencyLimit:
+    """
+    ASGI wrapper that lets at most ``limit`` requests into ``app`` at once.
+
+    Django's ASGIHandler runs every request in its own ThreadSensitiveContext,
+    so each request in flight holds its own sync thread and database
+    connection, however large the executor is. Requests over the limit wait
+    here on the event loop, holding neither, until one finishes.
+    """
+
+    def __init__(self, app, limit):
+        self.app = app
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope, receive, send):
+        async with self.semaphore:
+            await self.app(scope, receive, send)
@@ -0,0 +1,139 @@
+"""
+Sub-requests of /api/batch/.
+
+A batch authenticates once and replays each sub-request straight into its
+view, skipping the middleware and authentication classes the batch already
+went through. Sub-requests run concurrently on worker threads, each with its
+own database connection, and share their parent's request_cache() so lookups
+such as the visible projects happen once per batch. The parent's query
+wrappers (metrics, query log, profiling) are installed on each worker's
+connections, so the batch's queries are counted in full. Only GET requests
+are accepted, so the order they run in doesn't matter.
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Request headers describing the batch's own body, and its credentials, so
+# the regular authentication classes pass and BatchAuthentication applies
+_DROPPED_HEADERS = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_CONTENT_ENCODING",
+    "HTTP_AUTHORIZATION",
+)
+
+
+class RequestCache:
+    """
+    Memoizes lookups within one request. Sub-requests of a batch share their
+    parent's, so only cache what depends on nothing but the user.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        # Concurrent sub-requests wait for the first one to compute it
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.values:
+                self.values[key] = compute()
+        return self.values[key]
+
+
+def request_cache(request):
+    cache = getattr(request, "request_cache", None)
+    if cache is None:
+        cache = request.request_cache = RequestCache()
+    return cache
+
+
+class BatchAuthentication(BaseAuthentication):
+    """Passes the batch's user and token on to its sub-requests."""
+
+    def authenticate(self, request):
+        return getattr(request._request, "batch_auth", None)
+
+
+def build_subrequest(parent, path, query):
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {
+        key: value for key, value in parent.META.items() if key not in _DROPPED_HEADERS
+    }
+    request.META.update(REQUEST_METHOD="GET", PATH_INFO=path, QUERY_STRING=query)
+    request.GET = QueryDict(query)
+    request.COOKIES = parent.COOKIES
+    request.batch_auth = (parent.user, parent.auth)
+    request.request_cache = request_cache(parent)
+    return request
+
+
+def _error(status, detail):
+    return {"status": status, "body": {"detail": detail}}
+
+
+def run_subrequest(parent, url):
+    """Runs one GET ``url``; returns {"status", "body"}."""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/api/"):
+        return _error(400, "Only /api/ paths can be batched.")
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return _error(404, "Not found.")
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None or getattr(view_class, "batchable", True) is False:
+        return _error(400, "This endpoint can't be batched.")
+
+    request = build_subrequest(parent, parts.path, parts.query)
+    request.resolver_match = match
+    try:
+        with ExitStack() as stack:
+            # The middleware only wrapped the parent thread's connections
+            for wrapper in getattr(parent, "query_wrappers", ()):
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            response = match.func(request, *match.args, **match.kwargs)
+    except Exception:
+        # DRF re-raises errors it has no response for
+        logger.exception("Batched request to %s failed", parts.path)
+        return _error(500, "Server error.")
+    if not isinstance(response, Response):
+        return _error(400, "This endpoint can't be batched.")
+    return {"status": response.status_code, "body": response.data}
+
+
+async def run_batch(parent, urls):
+    """Runs the sub-requests, at most BATCH_CONCURRENCY at a time, in order."""
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    # Each thread checks its connection out of the pool and returns it
+    run = database_sync_to_async(run_subrequest, thread_sensitive=False)
+
+    async def limited(url):
+        async with semaphore:
+            return await run(parent, url)
+
+    return await asyncio.gather(*(limited(url) for url in urls))
@@ -0,0 +1,184 @@
+"""
+Channel layer that spreads groups over several Redis instances.
+
+channels_redis already accepts several hosts, but picks one with
+``crc32 % len(hosts)``: adding a host remaps almost every group, and a host
+that goes down takes its groups with it. ShardedRedisChannelLayer places the
+hosts on a hash ring instead, so a new host only takes over its share of
+groups. A group always lives on the host that owns its ring point; while
+that host is down, operations on it fail instead of moving elsewhere.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from bisect import bisect
+from functools import lru_cache
+
+from channels_redis.core import RedisChannelLayer
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class ShardUnavailable(RedisConnectionError):
+    """Raised without contacting a shard that failed its last health check."""
+
+
+SHARD_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+
+@lru_cache(maxsize=65536)
+def ring_point(value):
+    if isinstance(value, str):
+        value = value.encode("utf8")
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+def host_identity(host):
+    """A name for a host entry that doesn't depend on its position in the list."""
+    if "address" in host:
+        return str(host["address"])
+    if "sentinels" in host:
+        return f"sentinel:{host.get('master_name')}"
+    return f"{host.get('host')}:{host.get('port')}"
+
+
+class HashRing:
+    def __init__(self, names, virtual_nodes=160):
+        points = sorted(
+            (ring_point(f"{name}#{replica}"), index)
+            for index, name in enumerate(names)
+            for replica in range(virtual_nodes)
+        )
+        self.points = [point for point, _ in points]
+        self.owners = [index for _, index in points]
+        self.size = len(names)
+
+    def lookup(self, value):
+        """Index of the node owning ``value``: the first one clockwise from its point."""
+        return self.owners[bisect(self.points, ring_point(value)) % len(self.points)]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer routed by a consistent hash ring.
+
+    Every group (``project_{id}``), and every process's channel, lives on the
+    host that owns its ring point. Shards are pinged at most every
+    ``health_check_interval`` seconds, and a failed command marks its shard
+    down immediately. Operations on a down shard raise ShardUnavailable
+    until it answers again.
+
+    Health is tracked per process, so it never changes routing: if it did,
+    two processes that disagree about a shard would put a group_add and the
+    group_send meant for it on different hosts, and the message would be
+    lost without an error. Group memberships lost with a restarted shard are
+    rebuilt as consumers re-join (see WEBSOCKET_GROUP_REFRESH_INTERVAL).
+    """
+
+    def __init__(
+        self,
+        *args,
+        virtual_nodes=160,
+        health_check_interval=5,
+        health_check_timeout=0.5,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.ring = HashRing(
+            [host_identity(host) for host in self.hosts], virtual_nodes
+        )
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.down = set()
+        self._next_health_check = 0
+        self._checking = False
+
+    def consistent_hash(self, value):
+        if self.ring_size == 1:
+            return 0
+        if "!" in value:
+            # send() hashes the full process-local name while receive() and
+            # group_send() hash the process part; all of them must agree
+            value = self.non_local_name(value)
+        return self.ring.lookup(value)
+
+    def mark_down(self, index):
+        if index not in self.down:
+            logger.warning("Channel layer shard %s is down", self.hosts[index])
+            self.down.add(index)
+            # Probe again soon rather than waiting a full interval
+            self._next_health_check = min(
+                self._next_health_check, time.monotonic() + self.health_check_timeout
+            )
+
+    async def _ping(self, index):
+        try:
+            await asyncio.wait_for(
+                self.connection(index).ping(), self.health_check_timeout
+            )
+        except (*SHARD_ERRORS, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def check_health(self, force=False):
+        """Pings every shard once the interval has passed."""
+        if self.ring_size == 1 or self._checking:
+            return
+        if not force and time.monotonic() < self._next_health_check:
+            return
+        self._checking = True
+        try:
+            results = await asyncio.gather(
+                *(self._ping(index) for index in range(self.ring_size))
+            )
+        finally:
+            self._checking = False
+            self._next_health_check = time.monotonic() + self.health_check_interval
+        for index, healthy in enumerate(results):
+            if healthy and index in self.down:
+                logger.warning("Channel layer shard %s is back", self.hosts[index])
+                self.down.discard(index)
+            elif not healthy:
+                self.mark_down(index)
+
+    async def _routed(self, key, method, *args):
+        """Runs a single-shard operation, failing fast if its shard is down."""
+        await self.check_health()
+        index = self.consistent_hash(key)
+        if index in self.down:
+            raise ShardUnavailable(f"Channel layer shard {self.hosts[index]} is down")
+        try:
+            return await method(*args)
+        except SHARD_ERRORS:
+            self.mark_down(index)
+            raise
+
+    async def send(self, channel, message):
+        if "!" not in channel:
+            # Normal channels are spread round-robin, not by hash
+            return await super().send(channel, message)
+        return await self._routed(channel, super().send, channel, message)
+
+    async def receive_single(self, channel):
+        if "!" not in channel:
+            return await super().receive_single(channel)
+        return await self._routed(channel, super().receive_single, channel)
+
+    async def group_add(self, group, channel):
+        return await self._routed(group, super().group_add, group, channel)
+
+    async def group_discard(self, group, channel):
+        return await self._routed(group, super().group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        # Member channels may live on other shards, so a failure can't be
+        # pinned on the group's shard; the next health check sorts it out.
+        await self.check_health()
+        index = self.consistent_hash(group)
+        if index in self.down:
+            raise ShardUnavailable(f"Channel layer shard {self.hosts[index]} is down")
+        return await super().group_send(group, message)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries only the process that wrote them can see
+PER_PROCESS_CACHE_BACKENDS = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    return settings.CACHES[alias]["BACKEND"] not in PER_PROCESS_CACHE_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [
+        Error(
+            "The default cache is local to each process.",
+            hint=(
+                "Set CACHE_REDIS_URL. Replica pins, WebSocket connection caps "
+                "and unread notification counts must be shared by all "
+                "processes."
+            ),
+            id="common.E001",
+        )
+    ]
@@ -0,0 +1,65 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+
+_connections_opened = Counter()
+_lock = threading.Lock()
+
+
+def record_connection_created(sender, connection, **kwargs):
+    with _lock:
+        _connections_opened[connection.alias] += 1
+
+
+def get_pool_stats():
+    """
+    Returns connection usage per database alias.
+
+    connections_opened counts physical connects made by this process, so a
+    steadily climbing value means connections are churning. Pooled aliases
+    also report psycopg_pool's counters (pool_size, pool_available,
+    requests_waiting, requests_wait_ms, ...).
+    """
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        pool = getattr(connection, "pool", None)
+        entry = {
+            "vendor": connection.vendor,
+            "pooled": pool is not None,
+            "connections_opened": _connections_opened[alias],
+        }
+        if pool is not None:
+            entry.update(pool.get_stats())
+        stats[alias] = entry
+    return stats
+
+
+def collect_pool_metrics():
+    stats = get_pool_stats()
+    yield (
+        "db_connections_opened_total",
+        "counter",
+        "Physical database connections opened by this process",
+        [
+            ({"alias": alias}, entry["connections_opened"])
+            for alias, entry in stats.items()
+        ],
+    )
+    pooled = {alias: entry for alias, entry in stats.items() if entry["pooled"]}
+    keys = sorted(
+        {key for entry in pooled.values() for key in entry}
+        - {"vendor", "pooled", "connections_opened"}
+    )
+    for key in keys:
+        yield (
+            f"db_pool_{key}",
+            "gauge",
+            f"psycopg_pool {key}",
+            [
+                ({"alias": alias}, entry[key])
+                for alias, entry in pooled.items()
+                if key in entry
+            ],
+        )
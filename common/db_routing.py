@@ -0,0 +1,111 @@
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+# alias -> (checked_at, lag in seconds or None when the replica is unreachable)
+_replica_lag = {}
+
+
+@contextmanager
+def replica_reads():
+    """
+    Routes reads issued inside the block to a healthy replica.
+
+    Anything outside the block, and every write, goes to the primary.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _pin_key(client_key):
+    return f"db-primary-pin:{client_key}"
+
+
+def pin_to_primary(client_key):
+    """
+    Keeps a client on the primary for a while after it writes. The pin is
+    in the default cache, so only a shared one (CACHE_REDIS_URL) pins the
+    client's requests to other processes too.
+    """
+    cache.set(_pin_key(client_key), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(client_key):
+    return cache.get(_pin_key(client_key)) is not None
+
+
+def get_replica_lag(alias):
+    now = time.monotonic()
+    checked = _replica_lag.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+
+    try:
+        lag = _measure_replica_lag(connections[alias])
+    except Exception:
+        logger.warning("Replica %s is unreachable", alias, exc_info=True)
+        lag = None
+    _replica_lag[alias] = (now, lag)
+    return lag
+
+
+def _measure_replica_lag(connection):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE("
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+            )
+            return float(cursor.fetchone()[0])
+    # Local stand-ins such as a second SQLite file don't replicate, so they
+    # are never behind.
+    return 0.0
+
+
+def get_read_replica():
+    candidates = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if (lag := get_replica_lag(alias)) is not None
+        and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    if not candidates:
+        return DEFAULT_DB_ALIAS
+    return random.choice(candidates)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads made inside replica_reads() to a replica that is within
+    REPLICA_MAX_LAG_SECONDS of the primary, everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return get_read_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+from channels_redis.utils import _consistent_hash
+from django.core.management.base import BaseCommand
+
+from common.channel_layers import HashRing, ShardedRedisChannelLayer
+
+# Redis commands one channels_redis group_send issues on the group's shard
+# (ZREMRANGEBYSCORE, ZRANGE) and on each shard holding member channels
+# (expiry pipeline, EVAL)
+GROUP_COMMANDS = 2
+MEMBER_SHARD_COMMANDS = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Show how many groups move when a channel layer shard is added and how "
+        "evenly the hash ring spreads Redis commands; with --hosts, also "
+        "measure group_send throughput over 1..N Redis servers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hosts",
+            help="Comma-separated redis:// URLs to benchmark group_send against",
+        )
+        parser.add_argument(
+            "--shards", type=int, default=4, help="Shard count without --hosts"
+        )
+        parser.add_argument("--groups", type=int, default=2000)
+        parser.add_argument("--nodes", type=int, default=16, help="Server processes")
+        parser.add_argument(
+            "--group-nodes",
+            type=int,
+            default=2,
+            help="Server processes holding sockets of one project",
+        )
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=5, help="Seconds")
+
+    def handle(self, *args, **options):
+        groups = [f"project_{i}" for i in range(1, options["groups"] + 1)]
+        hosts = [host for host in (options["hosts"] or "").split(",") if host]
+        shard_count = len(hosts) or options["shards"]
+
+        self.show_reshuffle(groups, shard_count)
+        self.stdout.write("")
+        if not hosts:
+            self.show_spread(groups, shard_count, options)
+            self.stdout.write(
+                "\nPass --hosts to measure group_send throughput against real "
+                "Redis servers."
+            )
+            return
+
+        self.stdout.write(f"group_send against Redis at {', '.join(hosts)}:")
+        self.stdout.write(
+            f"{'shards':>6} {'sends/s':>10} {'speedup':>8} {'max/mean':>9}"
+        )
+        baseline = None
+        for count in range(1, len(hosts) + 1):
+            rate, balance = asyncio.run(self.run_redis(hosts[:count], groups, options))
+            baseline = baseline or rate
+            self.stdout.write(
+                f"{count:>6} {rate:>10.0f} {rate / baseline:>7.2f}x {balance:>9.2f}"
+            )
+
+    def show_reshuffle(self, groups, shard_count):
+        self.stdout.write("Groups moved when adding a shard:")
+        self.stdout.write(f"{'shards':>10} {'hash ring':>10} {'crc32 range':>12}")
+        for count in range(1, shard_count + 1):
+            before = HashRing([f"shard-{i}" for i in range(count)])
+            after = HashRing([f"shard-{i}" for i in range(count + 1)])
+            ring_moved = sum(
+                before.lookup(group) != after.lookup(group) for group in groups
+            )
+            modulo_moved = sum(
+                _consistent_hash(group, count) != _consistent_hash(group, count + 1)
+                for group in groups
+            )
+            self.stdout.write(
+                f"{count:>4} -> {count + 1:<3} "
+                f"{ring_moved / len(groups):>10.1%} {modulo_moved / len(groups):>12.1%}"
+            )
+
+    async def drive(self, send, groups, options):
+        """Calls send(group) from concurrent workers; returns sends per second."""
+        deadline = time.monotonic() + options["duration"]
+        sent = 0
+
+        async def worker(offset):
+            nonlocal sent
+            index = offset
+            while time.monotonic() < deadline:
+                await send(groups[index % len(groups)])
+                sent += 1
+                index += options["concurrency"]
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(options["concurrency"])))
+        return sent / (time.monotonic() - start)
+
+    def group_nodes(self, group, options):
+        return random.Random(group).sample(
+            range(options["nodes"]), options["group_nodes"]
+        )
+
+    def show_spread(self, groups, shard_count, options):
+        """
+        Redis commands each shard receives when every group is sent to once,
+        from ring placement alone; nothing is sent to Redis.
+        """
+        self.stdout.write("Redis commands per shard, one group_send per group:")
+        self.stdout.write(f"{'shards':>6} {'max/mean':>9}")
+        for count in range(1, shard_count + 1):
+            ring = HashRing([f"shard-{i}" for i in range(count)])
+            commands = Counter()
+            for group in groups:
+                commands[ring.lookup(group)] += GROUP_COMMANDS
+                # Each server process's channel lives on one shard
+                for index in {
+                    ring.lookup(f"specific.node{node}!")
+                    for node in self.group_nodes(group, options)
+                }:
+                    commands[index] += MEMBER_SHARD_COMMANDS
+            balance = self.balance(commands[index] for index in range(count))
+            self.stdout.write(f"{count:>6} {balance:>9.2f}")
+
+    async def run_redis(self, hosts, groups, options):
+        layer = ShardedRedisChannelLayer(hosts=hosts, prefix="bench-shards")
+        channels = [
+            await layer.new_channel(f"bench{node}.") for node in range(options["nodes"])
+        ]
+        for group in groups:
+            for node in self.group_nodes(group, options):
+                await layer.group_add(group, channels[node])
+
+        counts = Counter()
+
+        async def send(group):
+            counts[layer.consistent_hash(group)] += 1
+            await layer.group_send(group, {"type": "bench.message"})
+
+        try:
+            rate = await self.drive(send, groups, options)
+        finally:
+            await layer.flush()
+        return rate, self.balance(counts[index] for index in range(len(hosts)))
+
+    def balance(self, loads):
+        loads = list(loads)
+        mean = sum(loads) / len(loads)
+        return max(loads) / mean if mean else 0
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from common import schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema served at /api/schema/ for the current code"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate even if the schema for this code version exists",
+        )
+
+    def handle(self, *args, **options):
+        code_version = schema.code_version()
+        if not options["force"] and schema.read(code_version) is not None:
+            self.stdout.write(f"Schema for code version {code_version} is up to date")
+            return
+        for path in schema.write(schema.generate(), code_version):
+            self.stdout.write(f"Wrote {path}")
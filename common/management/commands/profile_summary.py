@@ -0,0 +1,103 @@
+import io
+import json
+import pstats
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Summarize request profiles written by ProfilingMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=str(settings.PROFILING_DIR))
+        parser.add_argument("--route", help="Only include this route name")
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument(
+            "--profile", help="Show the cProfile stats of a single profile id"
+        )
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            help="pstats sort key used with --profile",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["dir"])
+        if options["profile"]:
+            self.show_profile(directory, options["profile"], options)
+            return
+
+        profiles = []
+        for path in sorted(directory.glob("*.json")):
+            with open(path) as fh:
+                profile = json.load(fh)
+            if options["route"] and profile["route"] != options["route"]:
+                continue
+            profiles.append(profile)
+        if not profiles:
+            raise CommandError(f"No profiles found in {directory}")
+
+        self.show_routes(profiles)
+        self.show_queries(profiles, options["limit"])
+
+    def show_routes(self, profiles):
+        routes = defaultdict(list)
+        for profile in profiles:
+            routes[(profile["method"], profile["route"])].append(profile)
+
+        self.stdout.write(
+            f"{'route':<40} {'n':>5} {'avg ms':>9} {'max ms':>9} "
+            f"{'queries':>8} {'sql ms':>8} {'ser ms':>8}"
+        )
+        rows = sorted(
+            routes.items(),
+            key=lambda item: -sum(p["duration_ms"] for p in item[1]),
+        )
+        for (method, route), items in rows:
+            n = len(items)
+            self.stdout.write(
+                f"{method + ' ' + route:<40} {n:>5} "
+                f"{sum(p['duration_ms'] for p in items) / n:>9.1f} "
+                f"{max(p['duration_ms'] for p in items):>9.1f} "
+                f"{sum(p['query_count'] for p in items) / n:>8.1f} "
+                f"{sum(p['query_ms'] for p in items) / n:>8.1f} "
+                f"{sum(p['serialization_ms'] for p in items) / n:>8.1f}"
+            )
+
+    def show_queries(self, profiles, limit):
+        total_ms = Counter()
+        calls = Counter()
+        origins = defaultdict(Counter)
+        for profile in profiles:
+            for query in profile["queries"]:
+                total_ms[query["sql"]] += query["duration_ms"]
+                calls[query["sql"]] += 1
+                origins[query["sql"]][query["origin"]] += 1
+
+        self.stdout.write(f"\nTop {limit} queries by total time")
+        for sql, ms in total_ms.most_common(limit):
+            origin = origins[sql].most_common(1)[0][0]
+            self.stdout.write(f"{ms:>9.1f} ms {calls[sql]:>6}x  {origin or '-'}")
+            self.stdout.write(f"    {sql[:200]}")
+
+    def show_profile(self, directory, profile_id, options):
+        summary_path = directory / f"{profile_id}.json"
+        stats_path = directory / f"{profile_id}.prof"
+        if not summary_path.exists() or not stats_path.exists():
+            raise CommandError(f"Profile {profile_id} not found in {directory}")
+
+        with open(summary_path) as fh:
+            profile = json.load(fh)
+        self.stdout.write(
+            f"{profile['method']} {profile['path']} -> {profile['status']} "
+            f"in {profile['duration_ms']:.1f} ms, {profile['query_count']} queries "
+            f"({profile['query_ms']:.1f} ms), serialization "
+            f"{profile['serialization_ms']:.1f} ms, render {profile['render_ms']:.1f} ms"
+        )
+        output = io.StringIO()
+        stats = pstats.Stats(str(stats_path), stream=output)
+        stats.sort_stats(options["sort"]).print_stats(options["limit"])
+        self.stdout.write(output.getvalue())
@@ -0,0 +1,169 @@
+import cProfile
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+from .metrics import counter, histogram
+from .profiling import QueryRecorder, save_profile
+from .query_log import QueryLog
+
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ["method", "route"],
+)
+HTTP_RESPONSES = counter(
+    "http_responses_total",
+    "HTTP responses by route and status code",
+    ["method", "route", "status"],
+)
+DB_QUERIES_PER_REQUEST = histogram(
+    "http_request_db_queries",
+    "Database queries issued per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_TIME_PER_REQUEST = histogram(
+    "http_request_db_seconds",
+    "Time spent in database queries per HTTP request",
+    ["route"],
+)
+
+
+class QueryStats:
+    """
+    execute_wrapper that counts and times the queries it sees. Batch
+    sub-requests share their parent's from worker threads.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.duration += elapsed
+                self.count += 1
+
+
+@contextmanager
+def wrap_queries(request, wrapper):
+    """
+    Installs ``wrapper`` on this thread's connections for the block. Batch
+    sub-requests run on other threads, with their own connections, and
+    install the request's wrappers there too (see common.batch).
+    """
+    request.query_wrappers = [*getattr(request, "query_wrappers", ()), wrapper]
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+def get_route_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """Records latency, status codes and database usage per route."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        queries = QueryStats()
+        with wrap_queries(request, queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        route = get_route_name(request)
+        HTTP_REQUEST_DURATION.observe(elapsed, method=request.method, route=route)
+        HTTP_RESPONSES.inc(
+            method=request.method, route=route, status=response.status_code
+        )
+        DB_QUERIES_PER_REQUEST.observe(queries.count, route=route)
+        DB_TIME_PER_REQUEST.observe(queries.duration, route=route)
+        return response
+
+
+class QueryLogMiddleware:
+    """Always-on slow query and repeated query (N+1) logging."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_log = QueryLog(request.path)
+        with wrap_queries(request, query_log):
+            response = self.get_response(request)
+        query_log.route = get_route_name(request)
+        query_log.report()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles opted-in requests and writes the result to PROFILING_DIR.
+
+    A request is profiled when it sends "X-Profile: <PROFILING_TOKEN>" (any
+    value works with DEBUG and no token set) or is picked by
+    PROFILING_SAMPLE_RATE. The profile id is returned in X-Profile-Id;
+    summarize profiles with the profile_summary command.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        header = request.headers.get("X-Profile")
+        if header:
+            token = settings.PROFILING_TOKEN
+            if token:
+                return constant_time_compare(header, token)
+            return settings.DEBUG
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with wrap_queries(request, recorder):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        profile_id = save_profile(
+            profiler,
+            recorder,
+            {
+                "method": request.method,
+                "path": request.get_full_path(),
+                "route": get_route_name(request),
+                "status": response.status_code,
+                "duration_ms": round(elapsed_ms, 3),
+            },
+        )
+        response["X-Profile-Id"] = profile_id
+        return response
@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .db_routing import is_pinned_to_primary, pin_to_primary, replica_reads
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests from a read replica.
+
+    A successful write pins the client to the primary for
+    REPLICA_STICKY_SECONDS so it always reads its own writes.
+    """
+
+    def get_replica_client_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{request.META.get('REMOTE_ADDR')}"
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        client_key = self.get_replica_client_key(request)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(client_key):
+            self._replica_reads = replica_reads()
+            self._replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica_context = getattr(self, "_replica_reads", None)
+        if replica_context is not None:
+            self._replica_reads = None
+            replica_context.__exit__(None, None, None)
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(self.get_replica_client_key(request))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Serves unpaginated list requests with ``values_serializer_class``, a
+    read-only serializer that builds the response from .values() rows and
+    exposes it as ``.data``. Everything else uses serializer_class.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.values_serializer_class(queryset).data)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The object was changed by someone else."
+    default_code = "precondition_failed"
+
+    def __init__(self, version):
+        super().__init__()
+        # Kept as a number; APIException would turn it into a string
+        self.detail = {"detail": self.detail, "version": version}
+
+
+class VersionedUpdateMixin:
+    """
+    Optimistic concurrency for models with an integer ``version`` column.
+
+    Single-object responses carry the version as their ETag. Updates sent
+    with ``If-Match: "<version>"`` only apply if nobody saved the object
+    since; otherwise they fail with 412 and the current version. Views call
+    save_versioned() from perform_update().
+    """
+
+    def get_if_match_version(self):
+        header = self.request.headers.get("If-Match", "").strip()
+        if header in ("", "*"):
+            return None
+        tag = header.removeprefix("W/").strip('"')
+        try:
+            return int(tag)
+        except ValueError:
+            raise ValidationError({"If-Match": "Expected an ETag from this API."})
+
+    def check_version(self, instance):
+        """Fails early when If-Match already differs from ``instance``."""
+        expected = self.get_if_match_version()
+        if expected is not None and expected != instance.version:
+            raise PreconditionFailed(instance.version)
+        return expected
+
+    def save_versioned(self, serializer, **kwargs):
+        instance = serializer.instance
+        expected = self.check_version(instance)
+        if expected is None:
+            instance = serializer.save(version=F("version") + 1, **kwargs)
+            instance.refresh_from_db(fields=["version"])
+            return instance
+
+        model = type(instance)
+        with transaction.atomic():
+            # Claims the next version with a conditional UPDATE. The row stays
+            # locked until commit, so a concurrent writer with the same
+            # If-Match re-checks after us and matches nothing.
+            claimed = model._base_manager.filter(
+                pk=instance.pk, version=expected
+            ).update(version=F("version") + 1)
+            if not claimed:
+                current = (
+                    model._base_manager.filter(pk=instance.pk)
+                    .values_list("version", flat=True)
+                    .first()
+                )
+                raise PreconditionFailed(current)
+            return serializer.save(version=expected + 1, **kwargs)
+
+    def with_etag(self, response):
+        version = (
+            response.data.get("version") if isinstance(response.data, dict) else None
+        )
+        if version is not None:
+            response["ETag"] = f'"{version}"'
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.with_etag(super().retrieve(request, *args, **kwargs))
+
+    def create(self, request, *args, **kwargs):
+        return self.with_etag(super().create(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        return self.with_etag(super().update(request, *args, **kwargs))
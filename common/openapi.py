@@ -0,0 +1,20 @@
+"""
+drf-spectacular extensions. Only imported when the schema is generated, via
+SPECTACULAR_SETTINGS, so workers never load drf-spectacular; see common.schema.
+"""
+
+from drf_spectacular.generators import SchemaGenerator as BaseSchemaGenerator
+from drf_spectacular.openapi import AutoSchema
+from rest_framework.settings import api_settings
+
+
+class SchemaGenerator(BaseSchemaGenerator):
+    """Uses drf-spectacular's AutoSchema in place of DeferredAutoSchema."""
+
+    def get_schema(self, request=None, public=False):
+        previous = api_settings.DEFAULT_SCHEMA_CLASS
+        api_settings.DEFAULT_SCHEMA_CLASS = AutoSchema
+        try:
+            return super().get_schema(request=request, public=public)
+        finally:
+            api_settings.DEFAULT_SCHEMA_CLASS = previous
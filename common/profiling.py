@@ -0,0 +1,100 @@
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import sysconfig
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from .query_log import find_serializer_field
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = str(settings.BASE_DIR)
+# Virtualenvs often live inside the project, and the instrumentation in this
+# package is never the interesting origin of a query.
+_IGNORED_ROOTS = tuple(
+    sysconfig.get_paths()[key] for key in ("stdlib", "purelib", "platlib")
+) + (str(Path(__file__).resolve().parent),)
+
+
+def get_query_origin():
+    """Returns "file:line in function" for the innermost project frame."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_ROOT) and not filename.startswith(
+            _IGNORED_ROOTS
+        ):
+            filename = filename[len(_PROJECT_ROOT) :].lstrip("/")
+            return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    execute_wrapper that keeps every query with its timing and origin.
+
+    The origin is the innermost project frame, or the serializer field being
+    rendered when the query comes from inside DRF (e.g. a lazy relation).
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        origin = get_query_origin() or find_serializer_field()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "origin": origin,
+                }
+            )
+
+
+def _cumulative_ms(stats, filename_suffix, function_names):
+    """Largest cumulative time among matching functions, in milliseconds."""
+    cumulative = 0.0
+    for (filename, _, name), (_, _, _, ct, _) in stats.stats.items():
+        if name in function_names and filename.endswith(filename_suffix):
+            cumulative = max(cumulative, ct)
+    return round(cumulative * 1000, 3)
+
+
+def save_profile(profiler, recorder, summary):
+    """Writes <id>.prof (pstats) and <id>.json (summary and queries)."""
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    stats = pstats.Stats(profiler)
+    summary.update(
+        {
+            "id": profile_id,
+            # BaseSerializer.data is the entry point of every top level
+            # serialization, nested serializers only call to_representation.
+            "serialization_ms": _cumulative_ms(
+                stats, "rest_framework/serializers.py", {"data"}
+            ),
+            "render_ms": _cumulative_ms(
+                stats, "rest_framework/renderers.py", {"render"}
+            ),
+            "query_count": len(recorder.queries),
+            "query_ms": round(sum(q["duration_ms"] for q in recorder.queries), 3),
+            "queries": recorder.queries,
+        }
+    )
+    profiler.dump_stats(directory / f"{profile_id}.prof")
+    with open(directory / f"{profile_id}.json", "w") as fh:
+        json.dump(summary, fh, indent=2)
+    return profile_id
@@ -0,0 +1,71 @@
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def find_serializer_field():
+    """
+    Returns "Serializer.field" for the innermost DRF field being serialized
+    on the current stack, or None outside serialization.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "to_representation" and code.co_filename.endswith(
+            "rest_framework/serializers.py"
+        ):
+            field = frame.f_locals.get("field")
+            serializer = frame.f_locals.get("self")
+            if field is not None and serializer is not None:
+                return f"{type(serializer).__name__}.{field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryLog:
+    """
+    execute_wrapper that logs slow queries and flags the same SQL running
+    repeatedly within one request, which is usually an N+1 lookup.
+
+    The stack is only inspected when a query crosses the repeat threshold,
+    so well behaved requests pay for a counter update per query.
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.counts = Counter()
+        self.origins = {}
+        # Batch sub-requests log into their parent's from worker threads
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                logger.warning(
+                    "Slow query (%.1f ms) on %s: %s", elapsed_ms, self.route, sql
+                )
+            with self.lock:
+                self.counts[sql] += 1
+                repeated = self.counts[sql] == settings.REPEATED_QUERY_THRESHOLD
+            if repeated:
+                self.origins[sql] = find_serializer_field()
+
+    def report(self):
+        for sql, origin in self.origins.items():
+            logger.warning(
+                "Query repeated %d times on %s%s: %s",
+                self.counts[sql],
+                self.route,
+                f" (serializer field {origin})" if origin else "",
+                sql,
+            )
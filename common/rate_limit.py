@@ -0,0 +1,238 @@
+"""
+Token bucket rate limiting shared by the REST API and the WebSocket consumer.
+
+Limits are "N/period" strings from RATE_LIMIT_PLANS: a bucket holds up to N
+tokens and refills N per period, so a client may burst N requests and then
+continues at the average rate. Buckets are keyed by scope, route and user
+(client IP when anonymous) and kept in Redis when RATE_LIMIT_REDIS_URL is set, where
+each check is one script call updating one hash, so the limit holds across
+processes. Without it every process keeps its own buckets.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REJECTIONS = counter(
+    "rate_limit_rejections_total",
+    "Requests and WebSocket frames rejected by the rate limiter",
+    ["scope", "plan"],
+)
+RATE_LIMIT_ERRORS = counter(
+    "rate_limit_errors_total",
+    "Rate limit checks that failed and let the request through",
+)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Refills the bucket for the time since its last check, then takes ``cost``
+# tokens if there are enough. Uses the Redis clock so nodes don't need to
+# agree on the time. Returns the seconds to wait, as a string since Redis
+# truncates Lua numbers to integers.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # tokens per second
+    burst: int
+
+
+@lru_cache(maxsize=None)
+def parse_limit(spec):
+    """Parses "120/min" into a Limit; None means unlimited."""
+    if spec is None:
+        return None
+    count, period = spec.split("/")
+    count = int(count)
+    return Limit(rate=count / PERIODS[period.strip()[0]], burst=count)
+
+
+def limit_for(plan, scope):
+    rates = settings.RATE_LIMIT_PLANS.get(plan, {})
+    return parse_limit(rates.get(scope, rates.get("api")))
+
+
+class RedisRateLimiter:
+    def __init__(self, url):
+        import redis
+        import redis.asyncio
+
+        self.client = redis.Redis.from_url(url)
+        self.async_client = redis.asyncio.Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.async_script = self.async_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key, limit, cost=1):
+        """Takes ``cost`` tokens. Returns 0 if allowed, else seconds to wait."""
+        return float(self.script(keys=[key], args=[limit.rate, limit.burst, cost]))
+
+    async def aconsume(self, key, limit, cost=1):
+        return float(
+            await self.async_script(keys=[key], args=[limit.rate, limit.burst, cost])
+        )
+
+
+class LocalRateLimiter:
+    """
+    Stand-in for single-process setups, with the same semantics as
+    RedisRateLimiter but buckets in this process only.
+    """
+
+    # Buckets that have refilled completely are dropped once there are this
+    # many, since a missing bucket is a full one
+    sweep_threshold = 10000
+
+    def __init__(self):
+        # key -> [tokens, last check, time the bucket is full again]
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.next_sweep = self.sweep_threshold
+
+    def consume(self, key, limit, cost=1):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                tokens = limit.burst
+            else:
+                tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / limit.rate
+            self.buckets[key] = [tokens, now, now + (limit.burst - tokens) / limit.rate]
+            if len(self.buckets) >= self.next_sweep:
+                self.sweep(now)
+        return wait
+
+    async def aconsume(self, key, limit, cost=1):
+        return self.consume(key, limit, cost)
+
+    def sweep(self, now):
+        for key, (_, _, full_at) in list(self.buckets.items()):
+            if full_at <= now:
+                del self.buckets[key]
+        self.next_sweep = max(self.sweep_threshold, len(self.buckets) * 2)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                url = settings.RATE_LIMIT_REDIS_URL
+                _limiter = RedisRateLimiter(url) if url else LocalRateLimiter()
+    return _limiter
+
+
+def _key(scope, ident, route):
+    return f"ratelimit:{scope}:{route}:{ident}"
+
+
+def _result(wait, scope, plan):
+    if wait:
+        RATE_LIMIT_REJECTIONS.inc(scope=scope, plan=plan)
+    return wait
+
+
+def check_rate(scope, plan, ident, route=""):
+    """Counts a hit; returns 0 if allowed, else the seconds until it would be."""
+    limit = limit_for(plan, scope)
+    if limit is None:
+        return 0
+    try:
+        wait = get_rate_limiter().consume(_key(scope, ident, route), limit)
+    except Exception:
+        # A limiter outage shouldn't take the API down with it
+        logger.exception("Rate limit check failed")
+        RATE_LIMIT_ERRORS.inc()
+        return 0
+    return _result(wait, scope, plan)
+
+
+async def acheck_rate(scope, plan, ident, route=""):
+    limit = limit_for(plan, scope)
+    if limit is None:
+        return 0
+    try:
+        wait = await get_rate_limiter().aconsume(_key(scope, ident, route), limit)
+    except Exception:
+        logger.exception("Rate limit check failed")
+        RATE_LIMIT_ERRORS.inc()
+        return 0
+    return _result(wait, scope, plan)
+
+
+def plan_of(user):
+    if user is None or not user.is_authenticated:
+        return "anonymous"
+    return user.plan
+
+
+class PlanRateThrottle(BaseThrottle):
+    """
+    Limits each user by their plan's rate for the view's ``throttle_scope``
+    (default "api"), and anonymous clients by IP address. Every route has
+    its own bucket, so a busy endpoint doesn't use up the others' budget.
+
+    The IP comes from X-Forwarded-For only past the NUM_PROXIES proxies in
+    front of the app; with the default of 0 it is REMOTE_ADDR, since clients
+    can put anything in the header.
+    """
+
+    default_scope = "api"
+
+    def get_route(self, request, view):
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.view_name:
+            return match.view_name
+        return type(view).__name__
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None) or self.default_scope
+        user = getattr(request, "user", None)
+        plan = plan_of(user)
+        if plan == "anonymous":
+            ident = f"ip:{self.get_ident(request)}"
+        else:
+            ident = f"user:{user.pk}"
+        route = self.get_route(request, view)
+        self.wait_seconds = check_rate(scope, plan, ident, route)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
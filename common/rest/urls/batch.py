@@ -0,0 +1,7 @@
+from django.urls import path
+
+from common.rest.views.batch import BatchView
+
+urlpatterns = [
+    path("", BatchView.as_view(), name="batch"),
+]
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from common.rest.views.ops import DatabasePoolStats
+
+urlpatterns = [
+    path(
+        "db-pool/",
+        DatabasePoolStats.as_view(),
+        name="db-pool-stats",
+    )
+]
@@ -0,0 +1,35 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.batch import run_batch
+
+
+class BatchView(APIView):
+    """
+    Runs several GET requests against the API in one round trip, e.g. the
+    calls a dashboard makes on load. Takes {"requests": ["/api/...", ...]}
+    and returns {"responses": [{"status": ..., "body": ...}, ...]} in the
+    same order.
+    """
+
+    permission_classes = [IsAuthenticated]
+    # Sub-requests are throttled like the requests they replace
+    throttle_classes = []
+    batchable = False
+
+    def post(self, request, format=None):
+        urls = request.data.get("requests") if isinstance(request.data, dict) else None
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise ValidationError({"requests": "Expected a list of GET paths."})
+        if len(urls) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError(
+                {
+                    "requests": f"At most {settings.BATCH_MAX_REQUESTS}"
+                    " requests per batch."
+                }
+            )
+        return Response({"responses": async_to_sync(run_batch)(request, urls)})
@@ -0,0 +1,175 @@
+"""
+The OpenAPI schema, generated once per code version instead of per request.
+
+``manage.py build_schema`` runs drf-spectacular and writes the JSON and YAML
+renderings to SCHEMA_DIR, named after a fingerprint of the project's source
+code and the schema-related packages. Workers read the files for their
+fingerprint into memory on the first request and serve them with the
+fingerprint as ETag; if there are none (a deploy that skipped the command)
+the first request generates them. drf-spectacular itself is only imported
+to generate the schema or render the docs pages, never on worker boot.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+from importlib.metadata import version
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from rest_framework.schemas.inspectors import ViewInspector
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "json": "application/vnd.oai.openapi+json",
+    "yaml": "application/vnd.oai.openapi",
+}
+PACKAGES = ["Django", "djangorestframework", "drf-spectacular"]
+
+
+class DeferredAutoSchema(ViewInspector):
+    """
+    DEFAULT_SCHEMA_CLASS placeholder. DRF creates one whenever a viewset's
+    attributes are listed, which routers do while the URLconf loads, so
+    naming drf-spectacular's AutoSchema there imports it on worker boot.
+    common.openapi.SchemaGenerator swaps the real one in while generating.
+    """
+
+
+_renderings = {}
+_lock = threading.Lock()
+
+
+def _source_dirs():
+    base_dir = Path(settings.BASE_DIR).resolve()
+    dirs = {base_dir / settings.ROOT_URLCONF.split(".")[0]}
+    for app_config in apps.get_app_configs():
+        path = Path(app_config.path).resolve()
+        if path.is_relative_to(base_dir):
+            dirs.add(path)
+    return sorted(dirs)
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """Fingerprint of everything the schema is generated from."""
+    digest = hashlib.sha256()
+    for package in PACKAGES:
+        digest.update(f"{package}=={version(package)}\n".encode())
+    for directory in _source_dirs():
+        for path in sorted(directory.rglob("*.py")):
+            if "migrations" in path.parts:
+                continue
+            digest.update(str(path.relative_to(directory.parent)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_path(fmt, code_version):
+    return Path(settings.SCHEMA_DIR) / f"openapi-{code_version}.{fmt}"
+
+
+def generate():
+    """Runs drf-spectacular; returns {format: rendered bytes}."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+        "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+    }
+
+
+def write(renderings, code_version):
+    """Stores the renderings for ``code_version`` and drops older ones."""
+    directory = Path(settings.SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = set()
+    for fmt, content in renderings.items():
+        path = schema_path(fmt, code_version)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}")
+        temporary.write_bytes(content)
+        # Readers see either no file or a complete one
+        os.replace(temporary, path)
+        paths.add(path)
+    for path in directory.glob("openapi-*"):
+        if path not in paths:
+            path.unlink(missing_ok=True)
+    return sorted(paths)
+
+
+def read(code_version):
+    try:
+        return {fmt: schema_path(fmt, code_version).read_bytes() for fmt in FORMATS}
+    except FileNotFoundError:
+        return None
+
+
+def get_renderings():
+    current = code_version()
+    renderings = _renderings.get(current)
+    if renderings is None:
+        with _lock:
+            renderings = _renderings.get(current)
+            if renderings is None:
+                renderings = read(current)
+                if renderings is None:
+                    logger.warning(
+                        "No schema built for code version %s; generating it now",
+                        current,
+                    )
+                    renderings = generate()
+                    try:
+                        write(renderings, current)
+                    except OSError:
+                        logger.exception("Could not store the generated schema")
+                _renderings[current] = renderings
+    return current, renderings
+
+
+def _requested_format(request):
+    fmt = request.GET.get("format")
+    if fmt in FORMATS:
+        return fmt
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+@require_safe
+def schema(request):
+    """Serves the stored schema as YAML, or JSON when asked for."""
+    fmt = _requested_format(request)
+    current, renderings = get_renderings()
+    etag = f'"{current}-{fmt}"'
+    response = HttpResponse(
+        renderings[fmt], content_type=f"{FORMATS[fmt]}; charset=utf-8"
+    )
+    response["ETag"] = etag
+    response["Vary"] = "Accept"
+    # Browsers may keep it but have to revalidate, which is a 304 until a deploy
+    response["Cache-Control"] = "no-cache"
+    response["Content-Disposition"] = f'inline; filename="schema.{fmt}"'
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@lru_cache(maxsize=None)
+def _docs_view(name):
+    from drf_spectacular import views
+
+    return getattr(views, name).as_view(url_name="schema")
+
+
+def swagger_ui(request, *args, **kwargs):
+    return _docs_view("SpectacularSwaggerView")(request, *args, **kwargs)
+
+
+def redoc(request, *args, **kwargs):
+    return _docs_view("SpectacularRedocView")(request, *args, **kwargs)
@@ -0,0 +1,13 @@
+'use strict';
+{
+    const $ = django.jQuery;
+    // Applies an AutocompleteFilter as soon as an option is picked
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const filter = this.closest('.autocomplete-filter');
+        const params = new URLSearchParams(filter.dataset.queryString);
+        if (this.value) {
+            params.set(this.name, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels_redis.core import RedisChannelLayer
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+
+from core.models import User
+from tracker.models import Project
+
+from . import middleware, rate_limit
+from .channel_layers import ShardedRedisChannelLayer, ShardUnavailable
+from .rate_limit import Limit, LocalRateLimiter
+
+
+class TokenBucketTests(TestCase):
+    def test_bucket_refills(self):
+        limiter = LocalRateLimiter()
+        limit = Limit(rate=1, burst=2)
+        with mock.patch("common.rate_limit.time.monotonic") as clock:
+            clock.return_value = 100.0
+            self.assertEqual(limiter.consume("key", limit), 0)
+            self.assertEqual(limiter.consume("key", limit), 0)
+            self.assertEqual(limiter.consume("key", limit), 1.0)
+
+            clock.return_value = 100.5
+            self.assertEqual(limiter.consume("key", limit), 0.5)
+            clock.return_value = 101.0
+            self.assertEqual(limiter.consume("key", limit), 0)
+            # Never refills past the burst
+            clock.return_value = 200.0
+            for _ in range(2):
+                self.assertEqual(limiter.consume("key", limit), 0)
+            self.assertEqual(limiter.consume("key", limit), 1.0)
+
+
+@override_settings(
+    RATE_LIMIT_REDIS_URL=None,
+    RATE_LIMIT_PLANS={
+        "anonymous": {"api": "60/min", "registration": "1/hour"},
+        "FREE": {"api": "2/min"},
+    },
+)
+class PlanRateThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="user@example.com", username="u")
+
+    def setUp(self):
+        # Fresh buckets for every test
+        patcher = mock.patch.object(rate_limit, "_limiter", LocalRateLimiter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_over_the_limit_answers_429_with_retry_after(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertEqual(self.client.get("/api/projects/").status_code, 200)
+        response = self.client.get("/api/projects/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_routes_have_their_own_buckets(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.client.get("/api/projects/")
+        self.assertEqual(self.client.get("/api/projects/").status_code, 429)
+        self.assertEqual(self.client.get("/api/bugs/").status_code, 200)
+
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        response = self.client.post(
+            "/api/auth/register", {}, HTTP_X_FORWARDED_FOR="10.0.0.1"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/auth/register", {}, HTTP_X_FORWARDED_FOR="10.0.0.2"
+        )
+        self.assertEqual(response.status_code, 429)
+
+
+class ShardedChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = ShardedRedisChannelLayer(
+            hosts=["redis://127.0.0.1:6390", "redis://127.0.0.1:6391"]
+        )
+        # No Redis here; keep health checks from pinging it
+        self.layer.check_health = mock.AsyncMock()
+        patcher = mock.patch("common.channel_layers.logger")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.group = "project_1"
+        self.index = self.layer.consistent_hash(self.group)
+
+    def test_down_shard_does_not_move_its_groups(self):
+        self.layer.mark_down(self.index)
+        self.assertEqual(self.layer.consistent_hash(self.group), self.index)
+
+    def test_operations_on_a_down_shard_fail_without_contacting_another(self):
+        self.layer.mark_down(self.index)
+        with (
+            mock.patch.object(RedisChannelLayer, "group_add") as group_add,
+            mock.patch.object(RedisChannelLayer, "group_send") as group_send,
+        ):
+            with self.assertRaises(ShardUnavailable):
+                async_to_sync(self.layer.group_add)(self.group, "specific.a!b")
+            with self.assertRaises(ShardUnavailable):
+                async_to_sync(self.layer.group_send)(self.group, {"type": "x"})
+        group_add.assert_not_called()
+        group_send.assert_not_called()
+
+    def test_failed_command_marks_its_shard_down(self):
+        with mock.patch.object(
+            RedisChannelLayer, "group_add", side_effect=RedisConnectionError
+        ) as group_add:
+            with self.assertRaises(RedisConnectionError):
+                async_to_sync(self.layer.group_add)(self.group, "specific.a!b")
+        self.assertEqual(group_add.call_count, 1)
+        self.assertEqual(self.layer.down, {self.index})
+
+
+class BatchQueryMetricsTests(TransactionTestCase):
+    # Sub-requests query from worker threads, which only see committed rows
+    def setUp(self):
+        self.user = User.objects.create_user(email="user@example.com", username="u")
+        Project.objects.create(name="Tracker", owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queries_for(self, method, path, **kwargs):
+        with mock.patch.object(middleware.DB_QUERIES_PER_REQUEST, "observe") as observe:
+            response = getattr(self.client, method)(path, format="json", **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return observe.call_args.args[0]
+
+    def test_sub_request_queries_count_towards_the_batch(self):
+        single = self.queries_for("get", "/api/projects/")
+        self.assertGreater(single, 0)
+        batched = self.queries_for(
+            "post", "/api/batch/", data={"requests": ["/api/projects/"]}
+        )
+        self.assertGreaterEqual(batched, single)
@@ -15,3 +15,9 @@ class UserStatus(models.TextChoices):
     HIDDEN = "HIDDEN", "Hidden"
     PAUSED = "PAUSED", "Paused"
     REMOVED = "REMOVED", "Removed"
+
+
+class UserPlan(models.TextChoices):
+    FREE = "FREE", "Free"
+    TEAM = "TEAM", "Team"
+    ENTERPRISE = "ENTERPRISE", "Enterprise"
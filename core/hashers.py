@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_waiting = None
+_executor_lock = threading.Lock()
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ups at once. Try again in a moment."
+    default_code = "hashing_busy"
+
+
+def get_hashing_executor():
+    """
+    Returns the process wide pool used for password hashing.
+
+    Hashing is CPU bound and deliberately slow, so it runs on a small bounded
+    pool instead of on every request thread at once. Bursts queue up here and
+    the remaining CPU stays free for regular API traffic.
+    """
+    global _executor, _waiting
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _waiting = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASHING_MAX_WAITING
+                )
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    thread_name_prefix="password-hashing",
+                )
+    return _executor
+
+
+def hash_password(raw_password):
+    """
+    Hashes the password on the hashing pool and waits for the result.
+
+    The calling thread blocks until the hash is done, so at most
+    PASSWORD_HASHING_MAX_WAITING request threads wait here at once; further
+    callers get HashingBusy (503) straight away instead of tying up more
+    threads. A hash that hasn't finished within PASSWORD_HASHING_TIMEOUT
+    seconds is cancelled if it hasn't started, and also ends in HashingBusy.
+    """
+    executor = get_hashing_executor()
+    if not _waiting.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = executor.submit(make_password, raw_password)
+        try:
+            return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingBusy()
+    finally:
+        _waiting.release()
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:23
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Merging accounts means moving their projects, bugs and comments, which
+    # is a decision for whoever runs the migration, not for the migration
+    User = apps.get_model("core", "User")
+    duplicates = list(
+        User.objects.annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("email_lower", flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Users share these emails apart from case; merge or rename them "
+            f"before adding the case-insensitive constraint: {', '.join(duplicates)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='core_user_email_ci_unique', violation_error_message='User with email already exists!'),
+        ),
+    ]
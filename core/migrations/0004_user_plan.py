@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_user_username_lower_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="plan",
+            field=models.CharField(
+                choices=[
+                    ("FREE", "Free"),
+                    ("TEAM", "Team"),
+                    ("ENTERPRISE", "Enterprise"),
+                ],
+                default="FREE",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -2,10 +2,11 @@ import logging
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 from common.models import BaseModelWithUID
 
-from .choices import UserGender, UserStatus
+from .choices import UserGender, UserPlan, UserStatus
 from .managers import CustomUserManager
 
 logger = logging.getLogger(__name__)
@@ -25,6 +26,12 @@ class User(AbstractUser, BaseModelWithUID):
         default=UserGender.UNKNOWN,
     )
     date_of_birth = models.DateField(null=True, blank=True)
+    # Selects the user's rate limits from RATE_LIMIT_PLANS
+    plan = models.CharField(
+        max_length=20,
+        choices=UserPlan.choices,
+        default=UserPlan.FREE,
+    )
 
     objects = CustomUserManager()
 
@@ -33,6 +40,19 @@ class User(AbstractUser, BaseModelWithUID):
 
     class Meta:
         ordering = ("-date_joined",)
+        constraints = [
+            # Emails are compared case-insensitively, so uniqueness is enforced
+            # on the lowered value instead of pre-checking in serializers.
+            models.UniqueConstraint(
+                Lower("email"),
+                name="core_user_email_ci_unique",
+                violation_error_message="User with email already exists!",
+            ),
+        ]
+        indexes = [
+            # Autocomplete scans a range of lowered usernames
+            models.Index(Lower("username"), name="core_user_username_lower_idx"),
+        ]
 
     def __str__(self):
         return f"UID: {self.uid}, Phone: {self.email}"
@@ -1,8 +1,10 @@
 import logging
 
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
 from core.choices import UserStatus
+from core.hashers import hash_password
 from core.models import User
 
 logger = logging.getLogger(__name__)
@@ -25,25 +27,27 @@ class PublicUserRegistrationSerializer(serializers.Serializer):
         )
 
     def validate_email(self, data):
-        email = data.lower()
-        if User.objects.filter(email=email).exists():
-            raise serializers.ValidationError("User with email already exists!")
-        return data
+        # Uniqueness is enforced by the case-insensitive constraint on insert.
+        return data.lower()
 
     def create(self, validated_data, *args, **kwargs):
-        email = validated_data["email"].lower()
-        password = validated_data["password"]
-        first_name = validated_data["first_name"]
-        last_name = validated_data["last_name"]
+        email = validated_data["email"]
 
-        user = User.objects.create(
+        user = User(
             email=email,
             username=email,
-            first_name=first_name,
-            last_name=last_name,
+            first_name=validated_data["first_name"],
+            last_name=validated_data["last_name"],
             is_active=True,
             status=UserStatus.ACTIVE,
         )
-        user.set_password(password)
-        user.save()
+        user.password = hash_password(validated_data["password"])
+
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"email": ["User with email already exists!"]}
+            )
         return user
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from core.rest.views.users import UserAutocomplete
+
+urlpatterns = [
+    path(
+        "autocomplete",
+        UserAutocomplete.as_view(),
+        name="user-autocomplete",
+    )
+]
@@ -1,3 +1,5 @@
+from concurrent.futures import TimeoutError as HashingTimeoutError
+
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -9,12 +11,21 @@ from ..serializers import registration
 class PublicUserRegistration(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    # Password hashing makes sign-ups expensive; limited per client IP
+    throttle_scope = "registration"
 
     def post(self, request, format=None):
         serializer = registration.PublicUserRegistrationSerializer(
             data=request.data, context={"request": request}
         )
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except HashingTimeoutError:
+                return Response(
+                    {"error": "Registration is busy, please retry shortly"},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "5"},
+                )
             return Response(True, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
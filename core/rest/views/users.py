@@ -0,0 +1,41 @@
+from django.db.models.functions import Lower
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models import User
+
+# Any signed-in user can search every account, so no email addresses
+AUTOCOMPLETE_FIELDS = ["id", "username", "first_name", "last_name"]
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+class UserAutocomplete(APIView):
+    permission_classes = [IsAuthenticated]
+    # Called on every keystroke, so it gets its own budget
+    throttle_scope = "autocomplete"
+
+    def get(self, request, format=None):
+        prefix = request.query_params.get("q", "").strip().lower()
+        try:
+            limit = int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        if not prefix:
+            return Response([])
+
+        # A range on the lowered username instead of LIKE, so the expression
+        # index is used on every backend
+        users = (
+            User.objects.filter(is_active=True)
+            .alias(username_lower=Lower("username"))
+            .filter(
+                username_lower__gte=prefix,
+                username_lower__lt=prefix + chr(0x10FFFF),
+            )
+            .order_by("username_lower")
+            .values(*AUTOCOMPLETE_FIELDS)
+        )
+        return Response(list(users[:limit]))
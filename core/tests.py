@@ -1,3 +1,31 @@
+import threading
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from core import hashers
+from core.models import User
+
+
+class RegistrationHashingTests(TestCase):
+    payload = {
+        "email": "new@example.com",
+        "password": "correct horse",
+        "first_name": "New",
+        "last_name": "User",
+    }
+
+    def test_registers(self):
+        response = self.client.post("/api/auth/register", self.payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(
+            User.objects.get(email="new@example.com").check_password("correct horse")
+        )
+
+    def test_fails_fast_when_hashing_is_saturated(self):
+        hashers.get_hashing_executor()
+        with mock.patch.object(hashers, "_waiting", threading.BoundedSemaphore(1)):
+            hashers._waiting.acquire()
+            response = self.client.post("/api/auth/register", self.payload)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,278 @@
+"""
+Activity log writes.
+
+By default log_activity() inserts the row inside the request, as before.
+With ACTIVITY_LOG_BUFFERED the entries are collected in memory and written
+by a background thread with bulk_create once ACTIVITY_LOG_BATCH_SIZE entries
+are waiting or ACTIVITY_LOG_FLUSH_INTERVAL seconds have passed.
+
+Buffered entries are handed to the writer when the request's transaction
+commits, so a rolled-back request logs nothing, and are appended to a
+per-process journal file at that point. The buffer is flushed at
+interpreter exit, and journals left behind by a process that died are
+replayed by the next writer to start.
+
+Durability: a committed entry survives the process crashing or being
+killed, because the journal write has reached the kernel. It does not
+survive the machine losing power or the kernel crashing before the page
+cache is written back, unless ACTIVITY_LOG_FSYNC is set, which fsyncs every
+append. Replay is at least once: a crash between an insert and removing its
+journal writes those rows again.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from common.metrics import counter
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FLUSHES = counter(
+    "activity_log_flushed_entries_total",
+    "Activity log entries written by the buffered writer",
+    ["result"],
+)
+
+FIELDS = ["project_id", "bug_id", "user_id", "action", "description"]
+
+
+def _to_record(entry):
+    record = {field: getattr(entry, field) for field in FIELDS}
+    record["created_at"] = entry.created_at.isoformat()
+    return record
+
+
+def _from_record(record):
+    return ActivityLog(
+        **{field: record[field] for field in FIELDS},
+        created_at=datetime.fromisoformat(record["created_at"]),
+    )
+
+
+class Journal:
+    """
+    Append-only file of pending entries, one JSON object per line.
+
+    The owning process holds an exclusive flock on it until its entries
+    are written, which tells other processes whether a journal they find is
+    orphaned.
+    """
+
+    def __init__(self, path, fd=None, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        if fd is None:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.fd = fd
+
+    @classmethod
+    def claim(cls, path, new_path):
+        """Takes over an orphaned journal, or returns None if it's in use."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        os.rename(path, new_path)
+        return cls(new_path, fd)
+
+    def append(self, record):
+        os.write(self.fd, (json.dumps(record) + "\n").encode())
+        if self.fsync:
+            os.fsync(self.fd)
+
+    def seal(self, path):
+        """Renames the journal once its entries are handed to a flush."""
+        os.rename(self.path, path)
+        self.path = path
+
+    def remove(self):
+        os.unlink(self.path)
+        os.close(self.fd)
+
+
+def write_entries(entries):
+    try:
+        ActivityLog.objects.bulk_create(entries)
+    except IntegrityError:
+        # The bug or project went away before the flush; keep the rest
+        for entry in entries:
+            entry.pk = None
+            try:
+                entry.save(force_insert=True)
+            except IntegrityError:
+                logger.warning("Dropping activity entry for a deleted object")
+
+
+def read_journal(path):
+    entries = []
+    with open(path) as fh:
+        for line in fh:
+            try:
+                entries.append(_from_record(json.loads(line)))
+            except ValueError:
+                # A write cut short by the crash
+                logger.warning("Skipping a truncated activity journal line")
+    return entries
+
+
+class BufferedActivityWriter:
+    def __init__(self, directory, batch_size, interval, fsync=False):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fsync = fsync
+        self.buffer = []
+        # Sealed journals with their entries, oldest first, until written
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.segments = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # The pid alone repeats across container restarts
+        self.prefix = f"activity-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.journal = self.new_journal()
+        self.recover()
+        self.thread = threading.Thread(
+            target=self.run, name="activity-log-writer", daemon=True
+        )
+        self.thread.start()
+
+    def new_journal(self):
+        return Journal(self.directory / f"{self.prefix}.log", fsync=self.fsync)
+
+    def recover(self):
+        """Queues journals whose process is gone for replay."""
+        for path in sorted(self.directory.glob("activity-*")):
+            if path.name.startswith(f"{self.prefix}."):
+                continue
+            journal = Journal.claim(
+                path, path.with_name(f"{self.prefix}.recovered-{path.name}")
+            )
+            if journal is None:
+                continue
+            entries = read_journal(journal.path)
+            logger.info("Replaying %s activity entries from %s", len(entries), path)
+            self.pending.append((journal, entries))
+
+    def add(self, entry):
+        with self.lock:
+            self.journal.append(_to_record(entry))
+            self.buffer.append(entry)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+            # Don't hold a database connection between flushes
+            connection.close()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                if self.buffer:
+                    self.segments += 1
+                    self.journal.seal(
+                        self.directory / f"{self.prefix}.{self.segments}.flushing"
+                    )
+                    self.pending.append((self.journal, self.buffer))
+                    self.buffer = []
+                    self.journal = self.new_journal()
+
+            while self.pending:
+                journal, entries = self.pending[0]
+                try:
+                    write_entries(entries)
+                except Exception:
+                    # Kept on disk and in memory; retried on the next flush
+                    logger.exception("Writing %s activity entries failed", len(entries))
+                    ACTIVITY_FLUSHES.inc(len(entries), result="error")
+                    return
+                ACTIVITY_FLUSHES.inc(len(entries), result="ok")
+                journal.remove()
+                self.pending.pop(0)
+
+    def close(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.wakeup.set()
+        self.flush()
+        if not self.pending:
+            self.journal.remove()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BufferedActivityWriter(
+                    settings.ACTIVITY_LOG_JOURNAL_DIR,
+                    settings.ACTIVITY_LOG_BATCH_SIZE,
+                    settings.ACTIVITY_LOG_FLUSH_INTERVAL,
+                    settings.ACTIVITY_LOG_FSYNC,
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def log_activity(project, bug, user, action, description):
+    entry = ActivityLog(
+        project=project,
+        bug=bug,
+        user=user,
+        action=action,
+        description=description,
+        created_at=timezone.now(),
+    )
+    if not settings.ACTIVITY_LOG_BUFFERED:
+        entry.save(force_insert=True)
+        return entry
+    # Nothing to log if the request's transaction rolls back
+    transaction.on_commit(lambda: get_writer().add(entry))
+    return entry
+
+
+def flush_activity():
+    """Writes buffered entries now; tests and benchmarks call this."""
+    if _writer is not None:
+        _writer.flush()
+
+
+def stop_writer():
+    """Flushes and shuts down the buffered writer, if one was started."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
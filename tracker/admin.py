@@ -1,18 +1,22 @@
 from django.contrib import admin
 
-from .models import ActivityLog, Bug, Comment, Project
+from common.admin import AutocompleteFilter, LargeTableAdmin
+
+from .models import ActivityLog, Bug, Comment, Notification, Project
 
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ["name", "owner", "created_at"]
     list_filter = ["created_at"]
+    list_select_related = ["owner"]
     search_fields = ["name", "description"]
-    filter_horizontal = ["members"]
+    # filter_horizontal would list every user on the change page
+    raw_id_fields = ["owner", "members"]
 
 
 @admin.register(Bug)
-class BugAdmin(admin.ModelAdmin):
+class BugAdmin(LargeTableAdmin):
     list_display = [
         "title",
         "project",
@@ -22,20 +26,33 @@ class BugAdmin(admin.ModelAdmin):
         "created_by",
         "created_at",
     ]
-    list_filter = ["status", "priority", "project", "created_at"]
+    list_filter = ["status", "priority", ("project", AutocompleteFilter)]
+    list_select_related = ["project", "assigned_to", "created_by"]
+    date_hierarchy = "created_at"
     search_fields = ["title", "description"]
     raw_id_fields = ["assigned_to", "created_by", "project"]
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ["bug", "commenter", "created_at"]
-    list_filter = ["created_at"]
+    list_select_related = ["bug__project", "commenter"]
+    date_hierarchy = "created_at"
     raw_id_fields = ["bug", "commenter"]
 
 
 @admin.register(ActivityLog)
-class ActivityLogAdmin(admin.ModelAdmin):
+class ActivityLogAdmin(LargeTableAdmin):
     list_display = ["user", "action", "project", "bug", "created_at"]
-    list_filter = ["action", "created_at"]
+    list_filter = ["action", ("project", AutocompleteFilter)]
+    list_select_related = ["user", "project", "bug__project"]
+    date_hierarchy = "created_at"
     raw_id_fields = ["user", "project", "bug"]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ["recipient", "kind", "project", "bug", "is_read", "created_at"]
+    list_filter = ["kind", "is_read", "created_at"]
+    list_select_related = ["recipient", "project", "bug__project"]
+    raw_id_fields = ["recipient", "actor", "project", "bug"]
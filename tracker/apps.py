@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        from common.metrics import REGISTRY
+
+        from . import sync, work_queue
+        from .metrics import collect_channel_layer_metrics
+        from .outbox import collect_outbox_metrics
+
+        REGISTRY.register_collector(collect_channel_layer_metrics)
+        REGISTRY.register_collector(collect_outbox_metrics)
+        sync.connect_signals()
+        work_queue.connect_signals()
@@ -17,3 +17,27 @@ ACTION_CHOICES = [
     ("assigned", "Assigned"),
     ("resolved", "Resolved"),
 ]
+
+NOTIFICATION_KIND_CHOICES = [
+    ("assigned", "Assigned to you"),
+    ("status_changed", "Status changed"),
+    ("commented", "New comment"),
+]
+
+SYNC_KIND_CHOICES = [
+    ("bug", "Bug"),
+    ("comment", "Comment"),
+    ("member", "Member"),
+]
+
+DELETION_KIND_CHOICES = [
+    ("project", "Project"),
+    ("bugs", "Bugs"),
+]
+
+DELETION_STATUS_CHOICES = [
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("done", "Done"),
+    ("failed", "Failed"),
+]
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# Open sockets on this process
+_node_connections = 0
+
+
+def _user_key(user):
+    return f"ws-connections:user:{user.pk}"
+
+
+async def acquire_connection_slot(user):
+    """
+    Reserves a connection for ``user``. Returns None on success, or the
+    name of the cap that was hit.
+
+    The per-user count lives in the default cache, which holds the cap
+    across nodes once it is shared (CACHE_REDIS_URL; "check --deploy"
+    insists). Its TTL is refreshed by heartbeats, which lets counts held by
+    a crashed node expire.
+    """
+    global _node_connections
+    if _node_connections >= settings.WEBSOCKET_MAX_CONNECTIONS_PER_NODE:
+        return "node"
+
+    key = _user_key(user)
+    await cache.aadd(key, 0, settings.WEBSOCKET_CONNECTION_COUNT_TTL)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        # Expired between add and incr
+        await cache.aset(key, 1, settings.WEBSOCKET_CONNECTION_COUNT_TTL)
+        count = 1
+    if count > settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER:
+        await release_user_slot(user)
+        return "user"
+
+    _node_connections += 1
+    return None
+
+
+async def release_user_slot(user):
+    key = _user_key(user)
+    try:
+        count = await cache.adecr(key)
+    except ValueError:
+        return
+    if count < 0:
+        # The count expired and restarted while this socket was open, so
+        # it never counted it; add back what we took, keeping others' changes
+        await cache.aincr(key, -count)
+
+
+async def release_connection_slot(user):
+    global _node_connections
+    _node_connections -= 1
+    await release_user_slot(user)
+
+
+async def refresh_connection_slot(user):
+    await cache.atouch(_user_key(user), settings.WEBSOCKET_CONNECTION_COUNT_TTL)
+
+
+def get_node_connections():
+    return _node_connections
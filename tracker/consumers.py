@@ -1,38 +1,236 @@
-import json
+import asyncio
+import time
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 
-from .models import Project
+from common.channel_layers import SHARD_ERRORS
+from common.rate_limit import acheck_rate, plan_of
+
+from .connections import (
+    acquire_connection_slot,
+    refresh_connection_slot,
+    release_connection_slot,
+)
+from .encoding import decode, frame_cache, negotiate_encoding
+from .metrics import (
+    OUTBOX_DISCARDS,
+    OUTBOX_MERGES,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_EVENTS,
+    group_send,
+    subscriber_joined,
+    subscriber_left,
+)
+from .models import Bug, Project
+from .notifications import user_group
+from .outbox import Outbox, OutboxOverflow, SendWindow
+from .presence import debouncer, get_presence_store
+from .rest.serializers.tracker import BugSerializer
 
 
 class ProjectConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.project_id = self.scope["url_route"]["kwargs"]["project_id"]
+        self.project_id = int(self.scope["url_route"]["kwargs"]["project_id"])
         self.project_group_name = f"project_{self.project_id}"
+        self.subscribed = False
+        self.closing = False
+        self.rate_limited = False
+        self.encoding, subprotocol = negotiate_encoding(self.scope)
+        self.outbox = Outbox(
+            settings.WEBSOCKET_OUTBOX_SIZE, settings.WEBSOCKET_OUTBOX_POLICIES
+        )
+        self.window = SendWindow(settings.WEBSOCKET_SEND_WINDOW)
+        self.writer = None
+        self.heartbeat = None
+        self.last_seen = time.monotonic()
+        # Only clients that have answered a ping are evicted for silence
+        self.answers_pings = False
+        self.presence = get_presence_store(self.channel_layer)
 
         # Check if user has access to this project
-        if await self.has_project_access():
-            await self.channel_layer.group_add(
-                self.project_group_name, self.channel_name
-            )
-            await self.accept()
-        else:
+        if not await self.has_project_access():
+            WEBSOCKET_EVENTS.inc(event="reject")
             await self.close()
+            return
+
+        capped = await acquire_connection_slot(self.scope["user"])
+        if capped:
+            WEBSOCKET_EVENTS.inc(event=f"reject_{capped}_cap")
+            await self.accept(subprotocol)
+            await self.send_event(
+                {"type": "error", "reason": "too_many_connections", "cap": capped}
+            )
+            await self.close(code=4029)
+            return
+
+        await self.channel_layer.group_add(self.project_group_name, self.channel_name)
+        # Personal notifications reach every socket the user has open
+        self.user_group_name = user_group(self.scope["user"].id)
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        self.subscribed = True
+        subscriber_joined(self.project_group_name)
+        WEBSOCKET_EVENTS.inc(event="connect")
+        WEBSOCKET_CONNECTIONS.inc()
+        await self.accept(subprotocol)
+        self.writer = asyncio.create_task(
+            self.outbox.drain(self.write_event, self.window)
+        )
+        self.heartbeat = asyncio.create_task(self.run_heartbeat())
+
+        user = self.scope["user"]
+        if await self.presence.join(self.project_id, user.id, self.channel_name):
+            debouncer.add(self.project_id, "joined", user.id, user.username)
 
     async def disconnect(self, close_code):
+        for task in (getattr(self, "writer", None), getattr(self, "heartbeat", None)):
+            if task is not None:
+                task.cancel()
+        self.writer = self.heartbeat = None
+        if not getattr(self, "subscribed", False):
+            return
+        self.subscribed = False
         await self.channel_layer.group_discard(
             self.project_group_name, self.channel_name
         )
+        await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        await release_connection_slot(self.scope["user"])
+        user = self.scope["user"]
+        if await self.presence.leave(self.project_id, user.id, self.channel_name):
+            debouncer.add(self.project_id, "left", user.id, user.username)
+        subscriber_left(self.project_group_name)
+        WEBSOCKET_EVENTS.inc(event="disconnect")
+        WEBSOCKET_CONNECTIONS.dec()
 
-    async def receive(self, text_data):
+    async def run_heartbeat(self):
+        """
+        Pings the client, evicts it once it has been silent for
+        WEBSOCKET_IDLE_TIMEOUT and periodically re-joins its groups so the
+        channel layer's group expiry never drops a live socket.
+
+        Listen-only clients never send a frame, so silence only means a dead
+        client once it has answered a ping before. Other dead sockets are
+        left to the server's WebSocket-level pings (Daphne's --ping-interval
+        and --ping-timeout).
+        """
+        last_refresh = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.WEBSOCKET_HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            if (
+                self.answers_pings
+                and now - self.last_seen > settings.WEBSOCKET_IDLE_TIMEOUT
+            ):
+                WEBSOCKET_EVENTS.inc(event="idle_evicted")
+                self.closing = True
+                self.heartbeat = None
+                await self.close(code=4000)
+                return
+
+            await self.enqueue({"type": "ping", "ts": int(time.time())})
+            await refresh_connection_slot(self.scope["user"])
+            await self.presence.touch(
+                self.project_id, self.scope["user"].id, self.channel_name
+            )
+            # Announce users whose node went away without disconnecting them
+            for user_id in await self.presence.expire(self.project_id):
+                debouncer.add(self.project_id, "left", user_id, None)
+            if now - last_refresh >= settings.WEBSOCKET_GROUP_REFRESH_INTERVAL:
+                try:
+                    await self.channel_layer.group_add(
+                        self.project_group_name, self.channel_name
+                    )
+                    await self.channel_layer.group_add(
+                        self.user_group_name, self.channel_name
+                    )
+                except SHARD_ERRORS:
+                    # The group's shard is down; try again next beat
+                    continue
+                last_refresh = now
+
+    async def send_event(self, payload, event_id=None):
+        """
+        Sends a payload in the connection's negotiated encoding. Returns the
+        frame's size.
+        """
+        frame = frame_cache.encode(event_id, payload, self.encoding)
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+        return len(frame)
+
+    async def write_event(self, payload, event_id=None):
+        """
+        The writer task's send: counts the frame against the send window
+        and pings for an acknowledgement before the window fills up.
+        """
+        if payload["type"] == "ping":
+            payload = {**payload, "id": self.window.probe()}
+        self.window.record(await self.send_event(payload, event_id))
+        if self.window.needs_probe():
+            probe = {"type": "ping", "ts": int(time.time()), "id": self.window.probe()}
+            self.window.record(await self.send_event(probe))
+
+    async def enqueue(self, payload, event_id=None):
+        """Queues an event for the writer task, applying backpressure."""
+        if self.closing:
+            return
         try:
-            data = json.loads(text_data)
+            discarded = self.outbox.put(payload, event_id)
+        except OutboxOverflow:
+            # Too slow to keep up: tell the client to reload instead of
+            # silently missing events
+            OUTBOX_DISCARDS.inc(reason="disconnect")
+            self.closing = True
+            self.writer.cancel()
+            self.writer = None
+            await self.send_event(
+                {"type": "resync_required", "reason": "slow_consumer"}
+            )
+            await self.close(code=4008)
+            return
+        if discarded == "coalesced":
+            OUTBOX_MERGES.inc()
+        elif discarded:
+            OUTBOX_DISCARDS.inc(reason=discarded)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # Any frame, including pongs, counts as a sign of life
+        self.last_seen = time.monotonic()
+        user = self.scope["user"]
+        wait = await acheck_rate("websocket", plan_of(user), f"user:{user.pk}")
+        if wait:
+            # Drop the frame; say so once per burst rather than per frame
+            if not self.rate_limited:
+                self.rate_limited = True
+                await self.enqueue(
+                    {
+                        "type": "error",
+                        "reason": "rate_limited",
+                        "retry_after": round(wait, 3),
+                    }
+                )
+            return
+        self.rate_limited = False
+        try:
+            data = decode(text_data, bytes_data)
+            if not isinstance(data, dict):
+                return
             message_type = data.get("type")
 
-            if message_type == "typing":
+            if message_type == "ping":
+                await self.enqueue({"type": "pong", "ts": data.get("ts")})
+            elif message_type == "pong":
+                self.answers_pings = True
+                # The client has read everything written before that ping
+                probe_id = data.get("id")
+                if isinstance(probe_id, int):
+                    self.window.ack(probe_id)
+            elif message_type == "typing":
                 # Handle typing indicator
-                await self.channel_layer.group_send(
+                await group_send(
                     self.project_group_name,
                     {
                         "type": "typing_indicator",
@@ -41,50 +239,83 @@ class ProjectConsumer(AsyncWebsocketConsumer):
                         "is_typing": data.get("is_typing", False),
                     },
                 )
-        except json.JSONDecodeError:
+            elif message_type == "bug_snapshot":
+                # Client missed a version and asks for the full bug
+                snapshot = await self.get_bug_snapshot(data.get("bug_id"))
+                if snapshot is not None:
+                    await self.enqueue(
+                        {
+                            "type": "bug_snapshot",
+                            "bug_id": snapshot["id"],
+                            "version": snapshot["version"],
+                            "data": snapshot,
+                        }
+                    )
+        except ValueError:
+            # Malformed JSON or msgpack frame
             pass
 
     # Handlers for different message types
     async def bug_update(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "bug_update",
-                    "event_type": event["event_type"],
-                    "bug_id": event["bug_id"],
-                    "data": event["data"],
-                }
-            )
-        )
+        message = {
+            "type": "bug_update",
+            "event_type": event["event_type"],
+            "bug_id": event["bug_id"],
+            "version": event["version"],
+        }
+        if "changes" in event:
+            message["changes"] = event["changes"]
+        else:
+            message["data"] = event["data"]
+        await self.enqueue(message, event.get("event_id"))
 
     async def comment_added(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "comment_added",
-                    "bug_id": event["bug_id"],
-                    "data": event["data"],
-                }
-            )
+        await self.enqueue(
+            {
+                "type": "comment_added",
+                "bug_id": event["bug_id"],
+                "data": event["data"],
+            },
+            event.get("event_id"),
         )
 
     async def typing_indicator(self, event):
         # Don't send typing indicator back to the sender
         if event["user"] != self.scope["user"].username:
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "type": "typing_indicator",
-                        "user": event["user"],
-                        "bug_id": event["bug_id"],
-                        "is_typing": event["is_typing"],
-                    }
-                )
+            await self.enqueue(
+                {
+                    "type": "typing_indicator",
+                    "user": event["user"],
+                    "bug_id": event["bug_id"],
+                    "is_typing": event["is_typing"],
+                },
+                event.get("event_id"),
             )
 
+    async def presence_diff(self, event):
+        await self.enqueue(
+            {
+                "type": "presence_diff",
+                "joined": event["joined"],
+                "left": event["left"],
+            },
+            event.get("event_id"),
+        )
+
+    async def notification(self, event):
+        await self.enqueue(
+            {
+                "type": "notification",
+                "data": event["data"],
+                "unread_count": event["unread_count"],
+            },
+            event.get("event_id"),
+        )
+
     async def activity_update(self, event):
-        await self.send(
-            text_data=json.dumps({"type": "activity_update", "data": event["data"]})
+        await self.enqueue(
+            {"type": "activity_update", "data": event["data"]},
+            event.get("event_id"),
         )
 
     @database_sync_to_async
@@ -95,6 +326,21 @@ class ProjectConsumer(AsyncWebsocketConsumer):
                 return False
 
             project = Project.objects.get(id=self.project_id)
-            return project.owner == user or user in project.members.all()
+            return (
+                project.owner_id == user.id
+                or project.members.filter(pk=user.pk).exists()
+            )
         except Project.DoesNotExist:
             return False
+
+    @database_sync_to_async
+    def get_bug_snapshot(self, bug_id):
+        try:
+            bug = (
+                Bug.objects.select_related("project", "assigned_to", "created_by")
+                .prefetch_related("comments__commenter")
+                .get(id=bug_id, project_id=self.project_id)
+            )
+        except (Bug.DoesNotExist, ValueError, TypeError):
+            return None
+        return BugSerializer(bug).data
@@ -0,0 +1,166 @@
+"""
+Background deletion of projects and bugs.
+
+Deleting a large project used to cascade through every bug, comment and
+activity entry in one request and one transaction. Now the request only
+marks the rows hidden (the default managers skip them) and queues a
+DeletionJob. ``manage.py run_deletion_jobs`` works through the job's steps,
+deleting at most DELETION_BATCH_SIZE rows per transaction and saving its
+progress after each batch. Steps are re-queried every batch, so a job taken
+over from a worker that died simply carries on. Each batch first checks that
+its worker still holds the job's token, so a worker that only stalled stops
+instead of running alongside the one that took over.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import sync, work_queue
+from .models import (
+    ActivityLog,
+    Bug,
+    Comment,
+    DeletionJob,
+    Notification,
+    Project,
+    SyncChange,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class JobTakenOver(Exception):
+    pass
+
+
+def schedule_project_deletion(project, user):
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(deleted_at=timezone.now())
+        work_queue.remove_project(project.pk)
+        return DeletionJob.objects.create(
+            kind="project", project_id=project.pk, requested_by=user
+        )
+
+
+def schedule_bug_deletion(project_id, bug_ids, user):
+    """Hides bugs of one project; clients get their tombstones right away."""
+    bug_ids = sorted(bug_ids)
+    with transaction.atomic():
+        # Drops their work queue entries too, see BugQuerySet
+        Bug.all_objects.filter(id__in=bug_ids).update(deleted_at=timezone.now())
+        sync.record_changes(project_id, "bug", bug_ids, deleted=True)
+        return DeletionJob.objects.create(
+            kind="bugs", project_id=project_id, bug_ids=bug_ids, requested_by=user
+        )
+
+
+def job_steps(job):
+    """(name, queryset) pairs, children before their parents."""
+    if job.kind == "project":
+        project_id = job.project_id
+        return [
+            ("comments", Comment.objects.filter(bug__project_id=project_id)),
+            ("notifications", Notification.objects.filter(project_id=project_id)),
+            ("activities", ActivityLog.objects.filter(project_id=project_id)),
+            ("sync_changes", SyncChange.objects.filter(project_id=project_id)),
+            ("bugs", Bug.all_objects.filter(project_id=project_id)),
+            (
+                "members",
+                Project.members.through.objects.filter(project_id=project_id),
+            ),
+            (
+                "projects",
+                Project.all_objects.filter(pk=project_id, deleted_at__isnull=False),
+            ),
+        ]
+    bug_ids = job.bug_ids
+    return [
+        ("comments", Comment.objects.filter(bug_id__in=bug_ids)),
+        ("notifications", Notification.objects.filter(bug_id__in=bug_ids)),
+        ("activities", ActivityLog.objects.filter(bug_id__in=bug_ids)),
+        ("bugs", Bug.all_objects.filter(id__in=bug_ids, deleted_at__isnull=False)),
+    ]
+
+
+def claim_job():
+    """Takes the oldest pending job, or a running one whose worker went quiet."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DELETION_JOB_STALE_SECONDS)
+    claimable = Q(status="pending") | Q(status="running", heartbeat_at__lt=stale)
+    worker = uuid.uuid4().hex
+    for job_id in (
+        DeletionJob.objects.filter(claimable)
+        .order_by("id")
+        .values_list("id", flat=True)[:10]
+    ):
+        claimed = DeletionJob.objects.filter(claimable, pk=job_id).update(
+            status="running",
+            heartbeat_at=now,
+            started_at=Coalesce("started_at", now),
+            worker=worker,
+        )
+        if claimed:
+            return DeletionJob.objects.get(pk=job_id)
+    return None
+
+
+def save_owned(job, fields=()):
+    """
+    Saves ``fields`` and bumps the heartbeat, but only while the job still
+    carries this worker's token. Returns whether it did.
+    """
+    job.heartbeat_at = timezone.now()
+    return bool(
+        DeletionJob.objects.filter(pk=job.pk, worker=job.worker).update(
+            heartbeat_at=job.heartbeat_at,
+            **{field: getattr(job, field) for field in fields},
+        )
+    )
+
+
+def run_job(job, batch_size, report=None):
+    steps = job_steps(job)
+    try:
+        if not job.totals:
+            job.totals = {name: queryset.count() for name, queryset in steps}
+            if not save_owned(job, ["totals"]):
+                raise JobTakenOver
+        for name, queryset in steps:
+            while True:
+                ids = list(
+                    queryset.order_by("pk").values_list("pk", flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                with transaction.atomic(), sync.suspended():
+                    # Locks the job row until the batch commits, so it can't
+                    # go stale and be claimed by another worker meanwhile
+                    if not save_owned(job):
+                        raise JobTakenOver
+                    queryset.model._base_manager.filter(pk__in=ids).delete()
+                    job.progress[name] = job.progress.get(name, 0) + len(ids)
+                    save_owned(job, ["progress"])
+                if report:
+                    report(job, name)
+    except JobTakenOver:
+        logger.warning("Deletion job %s was taken over by another worker", job.pk)
+        return job
+    except Exception as exc:
+        logger.exception("Deletion job %s failed", job.pk)
+        job.status = "failed"
+        job.error = str(exc)
+        save_owned(job, ["status", "error"])
+        return job
+
+    job.status = "done"
+    job.error = ""
+    job.finished_at = timezone.now()
+    save_owned(job, ["status", "error", "finished_at"])
+    return job
@@ -0,0 +1,74 @@
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+import msgpack
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+# WebSocket subprotocols clients can request, in the server's preference order
+SUBPROTOCOLS = {
+    "bugtracker.msgpack": MSGPACK,
+    "bugtracker.json": JSON,
+}
+
+
+def negotiate_encoding(scope):
+    """
+    Picks the frame encoding for a connection.
+
+    Clients ask for msgpack with the "bugtracker.msgpack" subprotocol, or
+    with ?encoding=msgpack when they can't set subprotocols. JSON is the
+    default. Returns (encoding, subprotocol to accept or None).
+    """
+    offered = scope.get("subprotocols") or []
+    for subprotocol, encoding in SUBPROTOCOLS.items():
+        if subprotocol in offered:
+            return encoding, subprotocol
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if query.get("encoding") == [MSGPACK]:
+        return MSGPACK, None
+    return JSON, None
+
+
+def encode(payload, encoding):
+    if encoding == MSGPACK:
+        return msgpack.packb(payload, default=str)
+    return json.dumps(payload)
+
+
+def decode(text_data=None, bytes_data=None):
+    """Decodes a client frame, msgpack when binary and JSON when text."""
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data)
+    return json.loads(text_data)
+
+
+class FrameCache:
+    """
+    Encodes each broadcast event at most once per encoding in this process.
+
+    Every subscriber receives its own copy of a group message, so without the
+    cache a project with N local sockets would serialize the event N times.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._frames = OrderedDict()
+
+    def encode(self, event_id, payload, encoding):
+        if event_id is None:
+            return encode(payload, encoding)
+
+        key = (event_id, encoding)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._frames[key] = encode(payload, encoding)
+            if len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+        return frame
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,70 @@
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.models import User
+from tracker.activity import flush_activity, stop_writer
+from tracker.models import ActivityLog, Bug, Project
+
+
+class Command(BaseCommand):
+    help = "Compare bug update latency with synchronous and buffered activity writes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(email="bench-activity@example.com")
+        project = Project.objects.create(name="Bench activity", owner=user)
+        bug = Bug.objects.create(
+            title="Bench bug", description="", project=project, created_by=user
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        self.stdout.write(
+            f"{'mode':<10} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6}"
+        )
+        try:
+            for buffered in (False, True):
+                with tempfile.TemporaryDirectory() as journal_dir, override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=["testserver"],
+                    # Measure the write path, not the broadcast
+                    CHANNEL_LAYERS={
+                        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+                    },
+                    ACTIVITY_LOG_BUFFERED=buffered,
+                    ACTIVITY_LOG_JOURNAL_DIR=journal_dir,
+                ):
+                    timings = self.run(client, bug, options["requests"])
+                    flush_activity()
+                    stop_writer()
+                rows = ActivityLog.objects.filter(project=project).count()
+                ActivityLog.objects.filter(project=project).delete()
+                timings.sort()
+                self.stdout.write(
+                    f"{'buffered' if buffered else 'sync':<10} "
+                    f"{statistics.mean(timings):>8.2f} "
+                    f"{statistics.median(timings):>8.2f} "
+                    f"{timings[int(len(timings) * 0.95)]:>8.2f} {rows:>6}"
+                )
+        finally:
+            project.delete()
+            user.delete()
+
+    def run(self, client, bug, requests):
+        timings = []
+        for i in range(requests):
+            status = "Resolved" if i % 2 == 0 else "Open"
+            start = time.perf_counter()
+            response = client.patch(
+                f"/api/bugs/{bug.id}/", {"status": status}, format="json"
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.content
+        return timings
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import User
+from tracker.models import Bug, Comment, Project
+from tracker.rest.serializers.tracker import BugFieldsSerializer, BugSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare bug_update payload size for full snapshots and field deltas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=300)
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(email="bench-bug-events@example.com")
+            project = Project.objects.create(name="Bench", owner=user)
+            bug = Bug.objects.create(
+                title="Bench bug",
+                description="Payload size benchmark " * 10,
+                project=project,
+                created_by=user,
+            )
+            Comment.objects.bulk_create(
+                Comment(bug=bug, commenter=user, message=f"Comment {i} " * 8)
+                for i in range(options["comments"])
+            )
+            bug = Bug.objects.get(pk=bug.pk)
+
+            with CaptureQueriesContext(connection) as full_queries:
+                full_event = {
+                    "type": "bug_update",
+                    "event_type": "bug_updated",
+                    "bug_id": bug.id,
+                    "data": BugSerializer(bug).data,
+                }
+                full_bytes = len(json.dumps(full_event).encode())
+
+            before = BugFieldsSerializer(bug).data
+            bug.status = "In Progress"
+            bug.version += 1
+            bug.save()
+            with CaptureQueriesContext(connection) as delta_queries:
+                after = BugFieldsSerializer(bug).data
+                delta_event = {
+                    "type": "bug_update",
+                    "event_type": "bug_updated",
+                    "bug_id": bug.id,
+                    "version": bug.version,
+                    "changes": {
+                        field: value
+                        for field, value in after.items()
+                        if before[field] != value and field != "version"
+                    },
+                }
+                delta_bytes = len(json.dumps(delta_event).encode())
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Status change on a bug with {options['comments']} comments")
+        self.stdout.write(
+            f"  full snapshot: {full_bytes:>8} bytes, "
+            f"{len(full_queries)} queries to build"
+        )
+        self.stdout.write(
+            f"  field delta:   {delta_bytes:>8} bytes, "
+            f"{len(delta_queries)} queries to build"
+        )
+        self.stdout.write(f"  reduction:     {full_bytes / delta_bytes:>8.1f}x")
@@ -0,0 +1,130 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+
+from core.models import User
+from tracker.models import ActivityLog, Bug, Comment, Project
+from tracker.rest.serializers.fast import (
+    FastActivityLogSerializer,
+    FastBugSerializer,
+    FastCommentSerializer,
+    FastProjectSerializer,
+)
+from tracker.rest.serializers.tracker import (
+    ActivityLogSerializer,
+    BugSerializer,
+    CommentSerializer,
+    ProjectSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = "Compare list serialization throughput of ModelSerializers and .values() serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bugs", type=int, default=1000)
+        parser.add_argument("--comments-per-bug", type=int, default=3)
+        parser.add_argument("--projects", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            self.create_data(options)
+            # Both paths get their queries optimized; only serialization differs
+            comments = Comment.objects.select_related("commenter")
+            cases = [
+                (
+                    "projects",
+                    ProjectSerializer,
+                    FastProjectSerializer,
+                    Project.objects.select_related("owner"),
+                ),
+                (
+                    "bugs",
+                    BugSerializer,
+                    FastBugSerializer,
+                    Bug.objects.select_related(
+                        "project", "assigned_to", "created_by"
+                    ).prefetch_related(Prefetch("comments", queryset=comments)),
+                ),
+                ("comments", CommentSerializer, FastCommentSerializer, comments),
+                (
+                    "activity",
+                    ActivityLogSerializer,
+                    FastActivityLogSerializer,
+                    ActivityLog.objects.select_related("user"),
+                ),
+            ]
+
+            self.stdout.write(
+                f"{'endpoint':<10} {'rows':>6} {'model rows/s':>13} {'queries':>8}"
+                f" {'values rows/s':>14} {'queries':>8} {'speedup':>8}"
+            )
+            for name, serializer_class, fast_serializer_class, queryset in cases:
+                model_rate, model_queries = self.measure(
+                    lambda: serializer_class(queryset.all(), many=True).data,
+                    options["repeat"],
+                )
+                fast_rate, fast_queries = self.measure(
+                    lambda: fast_serializer_class(queryset.all()).data,
+                    options["repeat"],
+                )
+                self.stdout.write(
+                    f"{name:<10} {queryset.count():>6} {model_rate:>13.0f}"
+                    f" {model_queries:>8} {fast_rate:>14.0f} {fast_queries:>8}"
+                    f" {fast_rate / model_rate:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def create_data(self, options):
+        users = [
+            User.objects.create_user(
+                email=f"bench-serializers-{i}@example.com",
+                username=f"bench-serializers-{i}",
+            )
+            for i in range(20)
+        ]
+        projects = Project.objects.bulk_create(
+            Project(name=f"Project {i}", owner=users[i % len(users)])
+            for i in range(options["projects"])
+        )
+        for i, project in enumerate(projects):
+            project.members.add(*users[i % 5 : i % 5 + 5])
+        bugs = Bug.objects.bulk_create(
+            Bug(
+                title=f"Bug {i}",
+                description="Serializer benchmark " * 5,
+                project=projects[i % len(projects)],
+                created_by=users[i % len(users)],
+                assigned_to=users[(i + 1) % len(users)] if i % 3 else None,
+            )
+            for i in range(options["bugs"])
+        )
+        Comment.objects.bulk_create(
+            Comment(bug=bug, commenter=users[j % len(users)], message=f"Comment {j}")
+            for bug in bugs
+            for j in range(options["comments_per_bug"])
+        )
+        ActivityLog.objects.bulk_create(
+            ActivityLog(
+                project=bug.project,
+                bug=bug,
+                user=bug.created_by,
+                action="created",
+                description=f'Bug "{bug.title}" was created',
+            )
+            for bug in bugs
+        )
+
+    def measure(self, serialize, repeat):
+        with CaptureQueriesContext(connection) as queries:
+            rows = len(serialize())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            serialize()
+        elapsed = time.perf_counter() - start
+        return rows * repeat / elapsed, len(queries)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.sync import compact
+
+
+class Command(BaseCommand):
+    help = "Drop superseded sync log entries and expired tombstones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tombstone-days",
+            type=int,
+            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help="Keep tombstones this many days; older sync tokens must reload",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["tombstone_days"])
+        superseded, tombstones = compact(cutoff)
+        self.stdout.write(
+            f"Removed {superseded} superseded entries and {tombstones} tombstones"
+        )
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tracker.deletion import claim_job, run_job
+from tracker.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = "Delete hidden projects and bugs in the background, batch by batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.DELETION_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.DELETION_JOB_POLL_INTERVAL,
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when no job is waiting"
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Queue failed jobs again before starting",
+        )
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            retried = DeletionJob.objects.filter(status="failed").update(
+                status="pending"
+            )
+            self.stdout.write(f"Queued {retried} failed jobs again")
+
+        while True:
+            job = claim_job()
+            if job is None:
+                if options["once"]:
+                    return
+                # Don't hold a database connection while idle
+                connection.close()
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(
+                f"Job {job.pk}: deleting {job.kind} of project {job.project_id}"
+            )
+            job = run_job(job, options["batch_size"], report=self.report)
+            self.stdout.write(f"Job {job.pk}: {job.status} {job.error}".rstrip())
+
+    def report(self, job, step):
+        self.stdout.write(
+            f"Job {job.pk}: {step} {job.progress[step]}/{job.totals.get(step, '?')}"
+        )
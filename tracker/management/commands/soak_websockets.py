@@ -0,0 +1,217 @@
+import asyncio
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+
+from core.models import User
+from tracker.connections import get_node_connections
+from tracker.metrics import GROUP_SUBSCRIBERS
+from tracker.models import Project
+from tracker.routing import websocket_urlpatterns
+
+
+def get_rss_mb():
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return float("nan")
+
+
+class Command(BaseCommand):
+    help = (
+        "Churn ProjectConsumer connections against the in-memory channel layer "
+        "and fail if memory keeps growing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=int, default=600, help="Seconds")
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--sample-interval", type=int, default=30)
+        parser.add_argument(
+            "--abandoned",
+            type=float,
+            default=0.1,
+            help="Share of clients that answer one ping, go silent and must be evicted",
+        )
+        parser.add_argument(
+            "--max-growth-mb",
+            type=float,
+            default=5.0,
+            help="Allowed traced memory growth after the first sample",
+        )
+
+    def handle(self, *args, **options):
+        heartbeat = 1
+        # Messages left on a closed socket's channel live until expiry, so
+        # keep it short enough that the first sample already covers them
+        layers = {
+            "default": {
+                "BACKEND": "channels.layers.InMemoryChannelLayer",
+                "CONFIG": {"expiry": heartbeat * 5},
+            }
+        }
+        with override_settings(
+            # DEBUG keeps up to 9000 queries per connection in memory
+            DEBUG=False,
+            CHANNEL_LAYERS=layers,
+            # Test database ids would collide with real users' counts
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "soak-websockets",
+                }
+            },
+            # Every client is the same user; a dropped pong would keep an
+            # abandoned client from being evicted
+            RATE_LIMIT_PLANS={},
+            WEBSOCKET_HEARTBEAT_INTERVAL=heartbeat,
+            WEBSOCKET_IDLE_TIMEOUT=heartbeat * 3,
+            WEBSOCKET_MAX_CONNECTIONS_PER_USER=options["clients"] * 2,
+        ):
+            # The soak user and project go in a test database, never the
+            # configured one
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={"default"}
+            )
+            try:
+                user = User.objects.create_user(email="soak-websockets@example.com")
+                project = Project.objects.create(name="Soak", owner=user)
+                samples = asyncio.run(self.soak(user, project, options))
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        baseline, final = samples[0], samples[-1]
+        growth = final - baseline
+        self.stdout.write(
+            f"Traced memory after first sample: {baseline:.2f} MB -> "
+            f"{final:.2f} MB ({growth:+.2f} MB)"
+        )
+        if growth > options["max_growth_mb"]:
+            raise CommandError(
+                f"Memory grew {growth:.2f} MB, over the {options['max_growth_mb']} MB limit"
+            )
+        self.stdout.write(self.style.SUCCESS("Memory stayed flat"))
+
+    async def soak(self, user, project, options):
+        application = URLRouter(websocket_urlpatterns)
+        deadline = time.monotonic() + options["duration"]
+        stats = {"connections": 0, "evicted": 0}
+
+        tracemalloc.start()
+        tasks = [
+            asyncio.create_task(self.broadcast(project, deadline)),
+            *(
+                asyncio.create_task(
+                    self.client(application, user, project, deadline, stats, options)
+                )
+                for _ in range(options["clients"])
+            ),
+        ]
+
+        samples = []
+        self.stdout.write(
+            f"{'elapsed':>8} {'opened':>8} {'evicted':>8} {'live':>6} "
+            f"{'traced MB':>10} {'rss MB':>8}"
+        )
+        started = time.monotonic()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(
+                min(options["sample_interval"], max(deadline - time.monotonic(), 0))
+            )
+            gc.collect()
+            traced = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+            samples.append(traced)
+            self.stdout.write(
+                f"{time.monotonic() - started:>8.0f} {stats['connections']:>8} "
+                f"{stats['evicted']:>8} {get_node_connections():>6} "
+                f"{traced:>10.2f} {get_rss_mb():>8.1f}"
+            )
+
+        await asyncio.gather(*tasks)
+        tracemalloc.stop()
+        leftover = GROUP_SUBSCRIBERS.get(group=f"project_{project.id}")
+        if get_node_connections() or leftover:
+            raise CommandError(
+                f"{get_node_connections()} connections and {leftover} group "
+                "subscribers left after all clients disconnected"
+            )
+        return samples
+
+    async def broadcast(self, project, deadline):
+        channel_layer = get_channel_layer()
+        version = 1
+        while time.monotonic() < deadline:
+            version += 1
+            await channel_layer.group_send(
+                f"project_{project.id}",
+                {
+                    "type": "bug_update",
+                    "event_type": "bug_updated",
+                    "bug_id": random.randint(1, 50),
+                    "version": version,
+                    "changes": {"status": random.choice(["Open", "Resolved"])},
+                },
+            )
+            await asyncio.sleep(0.05)
+
+    async def client(self, application, user, project, deadline, stats, options):
+        while time.monotonic() < deadline:
+            communicator = WebsocketCommunicator(
+                application, f"/ws/project/{project.id}/"
+            )
+            communicator.scope["user"] = user
+            connected, _ = await communicator.connect(timeout=10)
+            if not connected:
+                raise CommandError("Connection was rejected")
+            stats["connections"] += 1
+
+            if random.random() < options["abandoned"]:
+                # Answer the first ping, then die: the server must close the
+                # socket by itself
+                answered = False
+                while True:
+                    message = await communicator.receive_output(timeout=30)
+                    if message["type"] == "websocket.close":
+                        stats["evicted"] += 1
+                        break
+                    if not answered and "text" in message:
+                        answered = await self.acknowledge(communicator, message)
+            else:
+                for _ in range(random.randint(1, 5)):
+                    await communicator.send_json_to({"type": "ping"})
+                    await communicator.send_json_to(
+                        {"type": "typing", "bug_id": 1, "is_typing": True}
+                    )
+                    await asyncio.sleep(random.uniform(0.1, 0.5))
+                    while not await communicator.receive_nothing(timeout=0.01):
+                        message = await communicator.receive_output()
+                        await self.acknowledge(communicator, message)
+            await communicator.disconnect()
+
+    async def acknowledge(self, communicator, message):
+        """
+        Answers server pings so the send window keeps moving. Returns
+        whether the message was a ping it answered.
+        """
+        if "text" not in message:
+            return False
+        payload = json.loads(message["text"])
+        if payload.get("type") != "ping" or "id" not in payload:
+            return False
+        await communicator.send_json_to({"type": "pong", "id": payload["id"]})
+        return True
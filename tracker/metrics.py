@@ -0,0 +1,80 @@
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from common.metrics import counter, gauge, histogram
+
+WEBSOCKET_EVENTS = counter(
+    "websocket_connection_events_total",
+    "WebSocket connects, rejections and disconnects",
+    ["event"],
+)
+WEBSOCKET_CONNECTIONS = gauge(
+    "websocket_connections",
+    "Open WebSocket connections on this process",
+)
+GROUP_SUBSCRIBERS = gauge(
+    "channel_group_subscribers",
+    "Subscribers on this process per channel layer group",
+    ["group"],
+)
+OUTBOX_DISCARDS = counter(
+    "websocket_outbox_discarded_total",
+    "Outbound WebSocket events dropped or disconnected for backpressure",
+    ["reason"],
+)
+OUTBOX_MERGES = counter(
+    "websocket_outbox_merged_total",
+    "Outbound WebSocket events merged into a queued one for backpressure",
+)
+GROUP_SEND_DURATION = histogram(
+    "channel_layer_group_send_seconds",
+    "Latency of channel layer group_send calls",
+    ["message_type"],
+)
+
+
+def subscriber_joined(group):
+    GROUP_SUBSCRIBERS.inc(group=group)
+
+
+def subscriber_left(group):
+    GROUP_SUBSCRIBERS.dec(group=group)
+    if GROUP_SUBSCRIBERS.get(group=group) <= 0:
+        GROUP_SUBSCRIBERS.remove(group=group)
+
+
+async def group_send(group, message, channel_layer=None):
+    channel_layer = channel_layer or get_channel_layer()
+    # Lets consumers encode the event once per format, see FrameCache
+    message.setdefault("event_id", uuid.uuid4().hex)
+    start = time.perf_counter()
+    try:
+        await channel_layer.group_send(group, message)
+    finally:
+        GROUP_SEND_DURATION.observe(
+            time.perf_counter() - start, message_type=message["type"]
+        )
+
+
+def broadcast(group, message):
+    """Synchronous group_send for views, timed like the async one."""
+    async_to_sync(group_send)(group, message)
+
+
+def collect_channel_layer_metrics():
+    channel_layer = get_channel_layer()
+    # channels_redis buffers received messages per channel in receive_buffer,
+    # the in-memory layer keeps them in channels.
+    queues = getattr(channel_layer, "receive_buffer", None)
+    if queues is None:
+        queues = getattr(channel_layer, "channels", {})
+    depth = sum(queue.qsize() for queue in list(queues.values()))
+    yield (
+        "channel_layer_pending_messages",
+        "gauge",
+        "Messages received from the channel layer and not yet consumed",
+        [({}, depth)],
+    )
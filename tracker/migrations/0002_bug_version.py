@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bug',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counts(apps, schema_editor):
+    Bug = apps.get_model("tracker", "Bug")
+    Comment = apps.get_model("tracker", "Comment")
+    counts = (
+        Comment.objects.filter(bug=OuterRef("pk"))
+        .order_by()
+        .values("bug")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Bug.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_activitylog_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bug',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['bug', '-id'], name='comment_bug_idx'),
+        ),
+        migrations.RunPython(backfill_comment_counts, migrations.RunPython.noop),
+    ]
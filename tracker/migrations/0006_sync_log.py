@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_sync_log(apps, schema_editor):
+    """Logs every existing bug, comment and membership, so since=0 is a full sync."""
+    Project = apps.get_model("tracker", "Project")
+    Bug = apps.get_model("tracker", "Bug")
+    Comment = apps.get_model("tracker", "Comment")
+    SyncChange = apps.get_model("tracker", "SyncChange")
+    SyncCounter = apps.get_model("tracker", "SyncCounter")
+    Membership = Project.members.through
+
+    for project_id in Project.objects.values_list("id", flat=True).iterator():
+        objects = [
+            ("bug", Bug.objects.filter(project_id=project_id), "id"),
+            ("comment", Comment.objects.filter(bug__project_id=project_id), "id"),
+            ("member", Membership.objects.filter(project_id=project_id), "user_id"),
+        ]
+        seq = 0
+        for kind, queryset, column in objects:
+            changes = []
+            for object_id in queryset.order_by(column).values_list(column, flat=True):
+                seq += 1
+                changes.append(
+                    SyncChange(
+                        project_id=project_id, seq=seq, kind=kind, object_id=object_id
+                    )
+                )
+            SyncChange.objects.bulk_create(changes, batch_size=1000)
+        SyncCounter.objects.create(project_id=project_id, seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_bug_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='tracker.project')),
+                ('seq', models.BigIntegerField(default=0)),
+                ('pruned_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('bug', 'Bug'), ('comment', 'Comment'), ('member', 'Member')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_changes', to='tracker.project')),
+            ],
+            options={
+                'ordering': ['project', 'seq'],
+                'indexes': [models.Index(fields=['project', 'kind', 'object_id'], name='sync_change_object_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'seq'), name='sync_change_project_seq_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_sync_log, migrations.RunPython.noop),
+    ]
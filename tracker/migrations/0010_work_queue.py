@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:20
+
+from datetime import datetime, timedelta, timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# tracker.work_queue.sort_key as of this migration
+PRIORITY_RANKS = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def backfill_work_queues(apps, schema_editor):
+    Bug = apps.get_model("tracker", "Bug")
+    WorkQueueEntry = apps.get_model("tracker", "WorkQueueEntry")
+    bugs = (
+        Bug.objects.filter(
+            assigned_to__isnull=False,
+            deleted_at__isnull=True,
+            project__deleted_at__isnull=True,
+        )
+        .exclude(status="Resolved")
+        .values_list("id", "assigned_to_id", "project_id", "priority", "created_at")
+    )
+    entries = []
+    for bug_id, user_id, project_id, priority, created_at in bugs.iterator():
+        entries.append(
+            WorkQueueEntry(
+                bug_id=bug_id,
+                user_id=user_id,
+                project_id=project_id,
+                sort_key=PRIORITY_RANKS.get(priority, 4) * 10**16
+                + (created_at - EPOCH) // timedelta(microseconds=1),
+            )
+        )
+        if len(entries) == 1000:
+            WorkQueueEntry.objects.bulk_create(entries)
+            entries = []
+    WorkQueueEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_admin_created_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkQueueEntry',
+            fields=[
+                ('bug', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='tracker.bug')),
+                ('sort_key', models.BigIntegerField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'sort_key'],
+                'indexes': [models.Index(fields=['user', 'sort_key'], name='work_queue_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_work_queues, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_work_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='worker',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
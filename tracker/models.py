@@ -1,6 +1,54 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from .choices import ACTION_CHOICES, PRIORITY_CHOICES, STATUS_CHOICES
+from .choices import (
+    ACTION_CHOICES,
+    DELETION_KIND_CHOICES,
+    DELETION_STATUS_CHOICES,
+    NOTIFICATION_KIND_CHOICES,
+    PRIORITY_CHOICES,
+    STATUS_CHOICES,
+    SYNC_KIND_CHOICES,
+)
+
+
+class LiveProjectManager(models.Manager):
+    """Hides projects waiting for a background DeletionJob."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class BugQuerySet(models.QuerySet):
+    """Keeps work queues current for the bulk updates that skip save()."""
+
+    def update(self, **kwargs):
+        from .work_queue import QUEUE_FIELDS, refresh_bugs
+
+        fields = {self.model._meta.get_field(name).name for name in kwargs}
+        if not QUEUE_FIELDS.intersection(fields):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            # Taken first: the update may move bugs out of the filter
+            bug_ids = list(self.values_list("id", flat=True))
+            rows = super().update(**kwargs)
+            refresh_bugs(bug_ids)
+        return rows
+
+    update.alters_data = True
+
+
+class LiveBugManager(models.Manager.from_queryset(BugQuerySet)):
+    """Hides bugs waiting for a DeletionJob, or in a project that is."""
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(deleted_at__isnull=True, project__deleted_at__isnull=True)
+        )
 
 
 class Project(models.Model):
@@ -12,6 +60,13 @@ class Project(models.Model):
     members = models.ManyToManyField("core.User", related_name="projects", blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented on every change, for If-Match
+    version = models.PositiveIntegerField(default=1)
+    # Set when deletion is requested; the rows go in a DeletionJob
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveProjectManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -38,15 +93,91 @@ class Bug(models.Model):
     created_by = models.ForeignKey(
         "core.User", on_delete=models.CASCADE, related_name="created_bugs"
     )
+    # Incremented on every change so clients can detect missed updates
+    version = models.PositiveIntegerField(default=1)
+    # Kept up to date by Comment.save(), Comment.delete() and the bulk
+    # Comment queryset methods; Bug.save() leaves it alone. Comments removed
+    # by a cascade (deleting their commenter) or moved with QuerySet.update()
+    # aren't counted; call recount_comments() after those.
+    comment_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveBugManager()
+    all_objects = BugQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Default ordering, and the admin's date hierarchy lookups
+            models.Index(fields=["created_at"], name="bug_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.project.name}"
 
+    def save(self, *args, **kwargs):
+        # comment_count only changes through F() updates from Comment. A full
+        # save would write back the count loaded with this instance and lose
+        # comments added since, so it's left out unless named explicitly.
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "comment_count"
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        bug = super().from_db(db, field_names, values)
+        # Lets the sync log notice a bug moving to another project
+        if "project_id" in bug.__dict__:
+            bug._loaded_project_id = bug.project_id
+        return bug
+
+
+def recount_comments(bug_ids):
+    """Sets comment_count from the comments table for the given bugs."""
+    counts = (
+        Comment.objects.filter(bug=OuterRef("pk"))
+        .order_by()
+        .values("bug")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Bug.all_objects.filter(id__in=bug_ids).update(
+        comment_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+class CommentQuerySet(models.QuerySet):
+    """Recounts Bug.comment_count for the bulk paths that skip save()/delete()."""
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            bug_ids = set(self.values_list("bug_id", flat=True))
+            result = super().delete()
+            recount_comments(bug_ids)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            recount_comments({obj.bug_id for obj in objs})
+        return objs
+
 
 class Comment(models.Model):
     bug = models.ForeignKey(Bug, on_delete=models.CASCADE, related_name="comments")
@@ -55,12 +186,36 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # Comment pages walk a bug's comments by id
+            models.Index(fields=["bug", "-id"], name="comment_bug_idx"),
+            models.Index(fields=["created_at"], name="comment_created_idx"),
+        ]
 
     def __str__(self):
         return f"Comment on {self.bug.title} by {self.commenter.email}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Bug.objects.filter(pk=self.bug_id).update(
+                    comment_count=F("comment_count") + 1
+                )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Bug.objects.filter(pk=self.bug_id).update(
+                comment_count=F("comment_count") - 1
+            )
+        return result
+
 
 class ActivityLog(models.Model):
     project = models.ForeignKey(
@@ -72,10 +227,164 @@ class ActivityLog(models.Model):
     user = models.ForeignKey("core.User", on_delete=models.CASCADE)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the action happens, not when a buffered write reaches the table
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at"], name="activity_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} {self.action} - {self.description}"
+
+
+class Notification(models.Model):
+    recipient = models.ForeignKey(
+        "core.User", on_delete=models.CASCADE, related_name="notifications"
+    )
+    actor = models.ForeignKey(
+        "core.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="notifications"
+    )
+    bug = models.ForeignKey(
+        Bug,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+        null=True,
+        blank=True,
+    )
+    kind = models.CharField(max_length=20, choices=NOTIFICATION_KIND_CHOICES)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # Inbox pages walk a user's notifications newest first
+            models.Index(fields=["recipient", "-id"], name="notification_inbox_idx"),
+            models.Index(
+                fields=["recipient"],
+                condition=models.Q(is_read=False),
+                name="notification_unread_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient.email}: {self.message}"
+
+
+class WorkQueueEntry(models.Model):
+    """
+    An open bug in its assignee's work queue; see tracker.work_queue.
+    Unassigned and resolved bugs have no entry.
+    """
+
+    bug = models.OneToOneField(
+        Bug, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    user = models.ForeignKey("core.User", on_delete=models.CASCADE, related_name="+")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="+")
+    # Priority, then age, in one column so pages are a range scan
+    sort_key = models.BigIntegerField()
+
+    class Meta:
+        ordering = ["user", "sort_key"]
+        indexes = [
+            models.Index(fields=["user", "sort_key"], name="work_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"Bug {self.bug_id} for user {self.user_id}"
+
+
+class SyncCounter(models.Model):
+    """
+    Numbers a project's changes. Taking the next number locks the row until
+    the change is committed, so changes become visible in number order.
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    seq = models.BigIntegerField(default=0)
+    # Entries up to here were compacted away; older sync tokens need a reload
+    pruned_seq = models.BigIntegerField(default=0)
+
+
+class SyncChange(models.Model):
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="sync_changes"
+    )
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=SYNC_KIND_CHOICES)
+    # The bug or comment id, or the user id for memberships
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["project", "seq"]
+        constraints = [
+            # Sync reads are a range scan on this
+            models.UniqueConstraint(
+                fields=["project", "seq"], name="sync_change_project_seq_unique"
+            ),
+        ]
+        indexes = [
+            # Compaction looks for later changes to the same object
+            models.Index(
+                fields=["project", "kind", "object_id"], name="sync_change_object_idx"
+            ),
+        ]
+
+    def __str__(self):
+        action = "deleted" if self.deleted else "changed"
+        return f"{self.project_id}#{self.seq}: {self.kind} {self.object_id} {action}"
+
+
+class DeletionJob(models.Model):
+    """
+    Deletes a hidden project, or a set of hidden bugs, and everything under
+    them in bounded batches; see tracker.deletion.
+    """
+
+    kind = models.CharField(max_length=20, choices=DELETION_KIND_CHOICES)
+    # Plain ids: the job outlives the rows it deletes
+    project_id = models.BigIntegerField()
+    bug_ids = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=20, choices=DELETION_STATUS_CHOICES, default="pending"
+    )
+    requested_by = models.ForeignKey(
+        "core.User", on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    # Rows per step: found when the job started, and deleted so far
+    totals = models.JSONField(default=dict, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Bumped at the start and end of every batch; a running job that stops
+    # bumping is resumed
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Set by the claiming worker; one that lost the job to a takeover stops
+    worker = models.CharField(max_length=32, blank=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["status", "id"], name="deletion_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Delete {self.kind} of project {self.project_id} ({self.status})"
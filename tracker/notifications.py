@@ -0,0 +1,114 @@
+"""
+Per-user notification inbox.
+
+Events are fanned out on write: one row per recipient, inserted with a
+single bulk_create, so reading an inbox never has to join through bugs,
+comments and activity. Unread counts are cached and pushed to the
+recipient's open sockets along with the notification. With a per-process
+cache another worker's mark_read would leave a stale count behind, so
+counts are then read from the unread index every time.
+"""
+
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from common.checks import cache_is_shared
+
+from .metrics import group_send
+from .models import Notification
+from .rest.serializers.notifications import NotificationSerializer
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user):
+    return _unread_count(user.pk)
+
+
+def _unread_count(user_id):
+    if not cache_is_shared():
+        return _count_unread(user_id)
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = _count_unread(user_id)
+        cache.set(
+            _unread_key(user_id), count, settings.NOTIFICATION_UNREAD_CACHE_SECONDS
+        )
+    return count
+
+
+def _count_unread(user_id):
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def forget_unread_count(user):
+    if cache_is_shared():
+        cache.delete(_unread_key(user.pk))
+
+
+def _bump_unread_count(user_id):
+    if not cache_is_shared():
+        return _count_unread(user_id)
+    try:
+        return cache.incr(_unread_key(user_id))
+    except ValueError:
+        # Not cached: count from the table, which already has the new row
+        return _unread_count(user_id)
+
+
+async def _push(messages):
+    await asyncio.gather(
+        *(group_send(user_group(user_id), message) for user_id, message in messages)
+    )
+
+
+def notify(kind, recipient_ids, actor, bug, message):
+    """
+    Records a notification about ``bug`` for each recipient id other than
+    the actor's, then pushes it to their sockets once the transaction
+    commits. None ids (an unassigned bug) are skipped.
+    """
+    recipient_ids = set(recipient_ids) - {None, actor.pk}
+    if not recipient_ids:
+        return []
+
+    notifications = Notification.objects.bulk_create(
+        Notification(
+            recipient_id=user_id,
+            actor=actor,
+            project_id=bug.project_id,
+            bug=bug,
+            kind=kind,
+            message=message,
+        )
+        for user_id in sorted(recipient_ids)
+    )
+
+    def deliver():
+        messages = []
+        for notification in notifications:
+            unread = _bump_unread_count(notification.recipient_id)
+            messages.append(
+                (
+                    notification.recipient_id,
+                    {
+                        "type": "notification",
+                        "data": NotificationSerializer(notification).data,
+                        "unread_count": unread,
+                    },
+                )
+            )
+        async_to_sync(_push)(messages)
+
+    transaction.on_commit(deliver)
+    return notifications
@@ -0,0 +1,228 @@
+import asyncio
+import itertools
+import weakref
+from collections import OrderedDict, deque
+
+COALESCE = "coalesce"
+DROP_TYPING = "drop_typing"
+DISCONNECT = "disconnect"
+
+# Every live outbox, read by the metrics collector at scrape time
+_outboxes = weakref.WeakSet()
+
+
+class OutboxOverflow(Exception):
+    pass
+
+
+def merge_bug_updates(pending, event):
+    """
+    Folds a bug_update into one that is still queued for the same bug.
+
+    base_version tells the client which version the merged changes apply
+    on top of, since they now span more than one version step.
+    """
+    merged = dict(event)
+    merged["base_version"] = pending.get("base_version", pending["version"] - 1)
+    if "data" in pending:
+        # A queued full bug (bug_created) absorbs later deltas
+        merged["event_type"] = pending["event_type"]
+        merged["data"] = {
+            **pending["data"],
+            **event.get("changes", event.get("data", {})),
+            "version": event["version"],
+        }
+        merged.pop("changes", None)
+    elif "changes" in event:
+        merged["changes"] = {**pending["changes"], **event["changes"]}
+    return merged
+
+
+class SendWindow:
+    """
+    Bytes written to a client that it hasn't acknowledged yet.
+
+    ASGI servers don't report how much of a socket's output is still
+    buffered, and send() returns before the bytes reach the network, so the
+    client says how far it has read. The writer tags pings with an id and
+    the client answers {"type": "pong", "id": ...}. Once the pong arrives,
+    everything written before that ping has been received. With ``size``
+    bytes unacknowledged the window closes and the writer stops. Events then
+    wait in the Outbox, where the overflow policies apply.
+
+    Clients that predate the protocol never answer with an id, so the window
+    only applies once the first acknowledgement arrives; until then the
+    writer sends as fast as the server accepts.
+    """
+
+    # Unanswered pings remembered; a later pong also covers the older ones
+    max_probes = 64
+
+    def __init__(self, size):
+        self.size = size
+        self.sent = 0
+        self.acked = 0
+        self.probed = 0
+        # Set by the first acknowledgement
+        self.enforced = False
+        self._probes = deque(maxlen=self.max_probes)
+        self._ids = itertools.count(1)
+        self._open = asyncio.Event()
+        self._open.set()
+
+    @property
+    def in_flight(self):
+        return self.sent - self.acked
+
+    def record(self, nbytes):
+        self.sent += nbytes
+        if self.in_flight >= self.size:
+            self._open.clear()
+
+    def needs_probe(self):
+        """Whether to ping now, so acks arrive before the window closes."""
+        return self.sent - self.probed >= self.size // 4
+
+    def probe(self):
+        """Returns the id for a ping written after everything sent so far."""
+        probe_id = next(self._ids)
+        self._probes.append((probe_id, self.sent))
+        self.probed = self.sent
+        return probe_id
+
+    def ack(self, probe_id):
+        self.enforced = True
+        while self._probes and self._probes[0][0] <= probe_id:
+            _, sent = self._probes.popleft()
+            self.acked = max(self.acked, sent)
+        if self.in_flight < self.size:
+            self._open.set()
+
+    async def wait_open(self):
+        if self.enforced:
+            await self._open.wait()
+
+
+class Outbox:
+    """
+    Bounded queue of events waiting to be written to one WebSocket.
+
+    Consumer handlers put events here instead of sending inline, so the
+    consumer keeps draining its channel layer queue while a writer task
+    sends as fast as the client's SendWindow allows. Events are kept in
+    order until the queue is full; then the configured policies decide what
+    gives:
+
+    - coalesce: a bug_update merges with the queued one for the same bug,
+      and a typing indicator replaces the queued one for the same user and
+      bug. The result takes the new event's place at the back, so it never
+      overtakes events queued after the one it replaced
+    - drop_typing: the oldest queued typing indicator is discarded
+    - disconnect: OutboxOverflow is raised so the consumer can close with a
+      resync hint
+
+    Without a policy that frees room, the oldest event is discarded.
+    """
+
+    def __init__(self, max_size, policies):
+        self.max_size = max_size
+        self.policies = set(policies)
+        self._items = OrderedDict()
+        # Coalescing key -> sequence number of the queued event with it
+        self._latest = {}
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        _outboxes.add(self)
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _coalescing_key(payload):
+        if payload["type"] == "bug_update":
+            return ("bug_update", payload["bug_id"])
+        if payload["type"] == "typing_indicator":
+            return ("typing_indicator", payload["user"], payload["bug_id"])
+        return None
+
+    def put(self, payload, event_id=None):
+        """
+        Queues an event. When the queue is full, returns what made room:
+        "coalesced" if the event was merged with a queued one, "typing" or
+        "oldest" if a queued event was discarded. Otherwise None.
+        """
+        if len(self._items) >= self.max_size:
+            if COALESCE in self.policies and self._coalesce(payload):
+                return "coalesced"
+            discarded = self._make_room()
+        else:
+            discarded = None
+        self._append(payload, event_id)
+        return discarded
+
+    def _append(self, payload, event_id):
+        sequence = next(self._sequence)
+        self._items[sequence] = (payload, event_id)
+        key = self._coalescing_key(payload)
+        if key is not None:
+            self._latest[key] = sequence
+        self._ready.set()
+
+    def _coalesce(self, payload):
+        key = self._coalescing_key(payload)
+        sequence = self._latest.get(key)
+        if sequence is None:
+            return False
+        pending, _ = self._remove(sequence)
+        if payload["type"] == "bug_update":
+            payload = merge_bug_updates(pending, payload)
+        # The merged payload differs from the broadcast, so it can't share
+        # the encoded frame
+        self._append(payload, None)
+        return True
+
+    def _remove(self, sequence):
+        payload, event_id = self._items.pop(sequence)
+        key = self._coalescing_key(payload)
+        if key is not None and self._latest.get(key) == sequence:
+            del self._latest[key]
+        return payload, event_id
+
+    def _make_room(self):
+        if DROP_TYPING in self.policies:
+            for sequence, (payload, _) in self._items.items():
+                if payload["type"] == "typing_indicator":
+                    self._remove(sequence)
+                    return "typing"
+        if DISCONNECT in self.policies:
+            raise OutboxOverflow()
+        self._remove(next(iter(self._items)))
+        return "oldest"
+
+    async def drain(self, send, window):
+        """
+        Sends queued events in order with ``send(payload, event_id)``,
+        waiting while ``window`` is closed.
+        """
+        while True:
+            await self._ready.wait()
+            while self._items:
+                await window.wait_open()
+                await send(*self._remove(next(iter(self._items))))
+            self._ready.clear()
+
+
+def collect_outbox_metrics():
+    depths = [len(outbox) for outbox in list(_outboxes)]
+    yield (
+        "websocket_outbox_messages",
+        "gauge",
+        "Events queued for WebSocket clients on this process",
+        [({}, sum(depths))],
+    )
+    yield (
+        "websocket_outbox_max_depth",
+        "gauge",
+        "Deepest per-connection outbound queue on this process",
+        [({}, max(depths, default=0))],
+    )
@@ -0,0 +1,225 @@
+"""
+Who is online in each project, shared across nodes.
+
+Every socket refreshes an expiry score on each heartbeat. A user is online in
+a project while any of their sockets' scores lies in the future, so sockets
+on a node that died without disconnecting age out after PRESENCE_TTL.
+Consumers only learn about changes through debounced presence_diff events.
+"""
+
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .metrics import group_send
+
+
+def _project_key(project_id):
+    return f"presence:project:{project_id}"
+
+
+def _sockets_key(project_id, user_id):
+    return f"presence:project:{project_id}:user:{user_id}"
+
+
+class RedisPresenceStore:
+    """
+    Keeps presence in the channel layer's Redis. Per project a sorted set
+    maps user ids to their latest expiry, and per user a sorted set tracks
+    each socket, so a second tab closing doesn't mark the user offline.
+    """
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+
+    def _connection(self, project_id):
+        # Keep all presence keys of a project on the shard of its group
+        index = self.channel_layer.consistent_hash(f"project_{project_id}")
+        return self.channel_layer.connection(index)
+
+    async def join(self, project_id, user_id, channel_name):
+        """Registers a socket. Returns True if the user just came online."""
+        now = time.time()
+        expiry = now + settings.PRESENCE_TTL
+        project_key = _project_key(project_id)
+        sockets_key = _sockets_key(project_id, user_id)
+        connection = self._connection(project_id)
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zscore(project_key, user_id)
+            pipe.zadd(sockets_key, {channel_name: expiry})
+            pipe.expire(sockets_key, settings.PRESENCE_TTL)
+            pipe.zadd(project_key, {user_id: expiry}, gt=True)
+            pipe.expire(project_key, settings.PRESENCE_TTL)
+            previous, *_ = await pipe.execute()
+        return previous is None or float(previous) < now
+
+    async def touch(self, project_id, user_id, channel_name):
+        expiry = time.time() + settings.PRESENCE_TTL
+        project_key = _project_key(project_id)
+        sockets_key = _sockets_key(project_id, user_id)
+        connection = self._connection(project_id)
+        async with connection.pipeline(transaction=False) as pipe:
+            pipe.zadd(sockets_key, {channel_name: expiry})
+            pipe.expire(sockets_key, settings.PRESENCE_TTL)
+            pipe.zadd(project_key, {user_id: expiry}, gt=True)
+            pipe.expire(project_key, settings.PRESENCE_TTL)
+            await pipe.execute()
+
+    async def leave(self, project_id, user_id, channel_name):
+        """Removes a socket. Returns True if it was the user's last one."""
+        now = time.time()
+        project_key = _project_key(project_id)
+        sockets_key = _sockets_key(project_id, user_id)
+        connection = self._connection(project_id)
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zrem(sockets_key, channel_name)
+            pipe.zremrangebyscore(sockets_key, "-inf", now)
+            pipe.zcard(sockets_key)
+            _, _, remaining = await pipe.execute()
+        if remaining:
+            return False
+        return bool(await connection.zrem(project_key, user_id))
+
+    async def expire(self, project_id):
+        """Drops users whose sockets all stopped heartbeating."""
+        project_key = _project_key(project_id)
+        connection = self._connection(project_id)
+        stale = await connection.zrangebyscore(project_key, "-inf", time.time())
+        if not stale:
+            return []
+        async with connection.pipeline(transaction=False) as pipe:
+            for user_id in stale:
+                pipe.zrem(project_key, user_id)
+            removed = await pipe.execute()
+        # Only the node whose ZREM succeeded reports the user as gone
+        return [int(user_id) for user_id, ok in zip(stale, removed) if ok]
+
+    async def online(self, project_id):
+        connection = self._connection(project_id)
+        user_ids = await connection.zrangebyscore(
+            _project_key(project_id), time.time(), "+inf"
+        )
+        return [int(user_id) for user_id in user_ids]
+
+
+class LocalPresenceStore:
+    """
+    Stand-in for single-process setups such as the in-memory channel layer,
+    with the same semantics as RedisPresenceStore.
+    """
+
+    def __init__(self):
+        # project id -> user id -> channel name -> expiry
+        self.projects = {}
+
+    def _alive(self, sockets, now):
+        for channel_name, expiry in list(sockets.items()):
+            if expiry < now:
+                del sockets[channel_name]
+        return bool(sockets)
+
+    async def join(self, project_id, user_id, channel_name):
+        now = time.time()
+        users = self.projects.setdefault(project_id, {})
+        sockets = users.setdefault(user_id, {})
+        was_online = self._alive(sockets, now)
+        sockets[channel_name] = now + settings.PRESENCE_TTL
+        return not was_online
+
+    async def touch(self, project_id, user_id, channel_name):
+        sockets = self.projects.setdefault(project_id, {}).setdefault(user_id, {})
+        sockets[channel_name] = time.time() + settings.PRESENCE_TTL
+
+    async def leave(self, project_id, user_id, channel_name):
+        users = self.projects.get(project_id, {})
+        sockets = users.get(user_id)
+        if sockets is None:
+            return False
+        sockets.pop(channel_name, None)
+        if self._alive(sockets, time.time()):
+            return False
+        del users[user_id]
+        if not users:
+            self.projects.pop(project_id, None)
+        return True
+
+    async def expire(self, project_id):
+        now = time.time()
+        users = self.projects.get(project_id, {})
+        stale = [
+            user_id
+            for user_id, sockets in list(users.items())
+            if not self._alive(sockets, now)
+        ]
+        for user_id in stale:
+            del users[user_id]
+        return stale
+
+    async def online(self, project_id):
+        now = time.time()
+        users = self.projects.get(project_id, {})
+        return [
+            user_id
+            for user_id, sockets in users.items()
+            if any(expiry >= now for expiry in sockets.values())
+        ]
+
+
+_local_store = LocalPresenceStore()
+
+
+def get_presence_store(channel_layer=None):
+    channel_layer = channel_layer or get_channel_layer()
+    if hasattr(channel_layer, "connection") and hasattr(
+        channel_layer, "consistent_hash"
+    ):
+        return RedisPresenceStore(channel_layer)
+    return _local_store
+
+
+class PresenceDebouncer:
+    """
+    Collects joins and leaves per project for PRESENCE_DEBOUNCE_SECONDS and
+    broadcasts them as one presence_diff. A user who leaves and comes back
+    within the window (a page reload) cancels out and is never announced.
+    """
+
+    def __init__(self):
+        # project id -> user id -> ("joined" | "left", username)
+        self.pending = {}
+        self.flushes = {}
+
+    def add(self, project_id, change, user_id, username):
+        pending = self.pending.setdefault(project_id, {})
+        previous = pending.get(user_id)
+        if previous is not None and previous[0] != change:
+            del pending[user_id]
+        else:
+            pending[user_id] = (change, username)
+
+        if project_id not in self.flushes:
+            self.flushes[project_id] = asyncio.get_running_loop().call_later(
+                settings.PRESENCE_DEBOUNCE_SECONDS,
+                lambda: asyncio.ensure_future(self.flush(project_id)),
+            )
+
+    async def flush(self, project_id):
+        self.flushes.pop(project_id, None)
+        pending = self.pending.pop(project_id, {})
+        if not pending:
+            return
+        joined = [
+            {"id": user_id, "username": username}
+            for user_id, (change, username) in pending.items()
+            if change == "joined"
+        ]
+        left = [user_id for user_id, (change, _) in pending.items() if change == "left"]
+        await group_send(
+            f"project_{project_id}",
+            {"type": "presence_diff", "joined": joined, "left": left},
+        )
+
+
+debouncer = PresenceDebouncer()
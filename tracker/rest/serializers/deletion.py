@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from ...models import DeletionJob
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    bug_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "id",
+            "kind",
+            "project_id",
+            "bug_count",
+            "status",
+            "totals",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_bug_count(self, obj):
+        return len(obj.bug_ids)
@@ -0,0 +1,228 @@
+"""
+Read-only serializers for list endpoints, built from .values() rows.
+
+Each one returns the same data as its ModelSerializer in .tracker without
+creating model instances or serializer fields per row. Fields are compiled
+once per request into (key, mapper) pairs, and nested users, comments and
+counts are loaded with one query each and shared between rows.
+"""
+
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+from core.models import User
+
+from ...models import Bug, Comment, Project
+from .tracker import UserSerializer
+
+_datetime_field = serializers.DateTimeField()
+
+
+def value(column):
+    return itemgetter(column)
+
+
+def datetime(column):
+    get = itemgetter(column)
+    to_representation = _datetime_field.to_representation
+
+    def mapper(row):
+        when = get(row)
+        return None if when is None else to_representation(when)
+
+    return mapper
+
+
+def lookup(column, objects, default=None):
+    get = itemgetter(column)
+    return lambda row: objects.get(get(row), default)
+
+
+def load_users(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    users = User.objects.filter(id__in=user_ids).values(*UserSerializer.Meta.fields)
+    return {user["id"]: user for user in users}
+
+
+class ValuesSerializer:
+    """
+    ``columns`` are read with one .values() query; ``get_fields()`` returns
+    (output key, mapper) pairs in output order, where a mapper takes a row.
+    """
+
+    columns = []
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.rows = None
+
+    def get_fields(self, rows):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        self.rows = list(self.queryset.values(*self.columns))
+        fields = self.get_fields(self.rows)
+        return [{key: mapper(row) for key, mapper in fields} for row in self.rows]
+
+
+class FastCommentSerializer(ValuesSerializer):
+    columns = ["id", "bug_id", "message", "commenter_id", "created_at", "updated_at"]
+
+    def get_fields(self, rows):
+        users = load_users(row["commenter_id"] for row in rows)
+        return [
+            ("id", value("id")),
+            ("message", value("message")),
+            ("commenter", lookup("commenter_id", users)),
+            ("created_at", datetime("created_at")),
+            ("updated_at", datetime("updated_at")),
+        ]
+
+
+class FastBugFieldsSerializer(ValuesSerializer):
+    """Matches BugFieldsSerializer: a bug without its comments."""
+
+    columns = [
+        "id",
+        "title",
+        "description",
+        "status",
+        "priority",
+        "assigned_to_id",
+        "project_id",
+        "project__name",
+        "created_by_id",
+        "comment_count",
+        "version",
+        "created_at",
+        "updated_at",
+    ]
+
+    def get_fields(self, rows):
+        users = load_users(
+            user_id
+            for row in rows
+            for user_id in (row["assigned_to_id"], row["created_by_id"])
+        )
+        return [
+            ("id", value("id")),
+            ("title", value("title")),
+            ("description", value("description")),
+            ("status", value("status")),
+            ("priority", value("priority")),
+            ("assigned_to", lookup("assigned_to_id", users)),
+            ("project", value("project_id")),
+            ("project_name", value("project__name")),
+            ("created_by", lookup("created_by_id", users)),
+            ("version", value("version")),
+            ("created_at", datetime("created_at")),
+            ("updated_at", datetime("updated_at")),
+        ]
+
+
+class FastBugSerializer(FastBugFieldsSerializer):
+    def get_fields(self, rows):
+        fields = super().get_fields(rows)
+        comments = defaultdict(list)
+        if rows:
+            serializer = FastCommentSerializer(
+                Comment.objects.filter(bug_id__in=[row["id"] for row in rows])
+                # Matches bug.comments.all(); id orders equal timestamps
+                .order_by(*Comment._meta.ordering, "id")
+            )
+            data = serializer.data
+            for row, comment in zip(serializer.rows, data):
+                comments[row["bug_id"]].append(comment)
+        # BugSerializer puts comments and comment_count before version
+        position = [key for key, _ in fields].index("version")
+        fields[position:position] = [
+            ("comments", lookup("id", comments, [])),
+            ("comment_count", value("comment_count")),
+        ]
+        return fields
+
+
+class FastProjectSerializer(ValuesSerializer):
+    columns = [
+        "id",
+        "name",
+        "description",
+        "owner_id",
+        "version",
+        "created_at",
+        "updated_at",
+    ]
+
+    def get_fields(self, rows):
+        project_ids = [row["id"] for row in rows]
+        memberships = Project.members.through.objects.filter(project_id__in=project_ids)
+        previews = []
+        member_counts = {}
+        bug_counts = {}
+        if project_ids:
+            # The lowest user ids of each project, like ProjectSerializer
+            previews = list(
+                memberships.annotate(
+                    position=Window(
+                        RowNumber(),
+                        partition_by=[F("project_id")],
+                        order_by=F("user_id").asc(),
+                    )
+                )
+                .filter(position__lte=settings.PROJECT_MEMBER_PREVIEW_SIZE)
+                .order_by("project_id", "user_id")
+                .values_list("project_id", "user_id")
+            )
+            member_counts = dict(
+                memberships.order_by()
+                .values("project_id")
+                .annotate(count=Count("id"))
+                .values_list("project_id", "count")
+            )
+            bug_counts = dict(
+                Bug.objects.filter(project_id__in=project_ids)
+                .order_by()
+                .values("project_id")
+                .annotate(count=Count("id"))
+                .values_list("project_id", "count")
+            )
+        users = load_users(
+            [row["owner_id"] for row in rows] + [user_id for _, user_id in previews]
+        )
+        members = defaultdict(list)
+        for project_id, user_id in previews:
+            members[project_id].append(users[user_id])
+        return [
+            ("id", value("id")),
+            ("name", value("name")),
+            ("description", value("description")),
+            ("owner", lookup("owner_id", users)),
+            ("members", lookup("id", members, [])),
+            ("member_count", lookup("id", member_counts, 0)),
+            ("bug_count", lookup("id", bug_counts, 0)),
+            ("version", value("version")),
+            ("created_at", datetime("created_at")),
+            ("updated_at", datetime("updated_at")),
+        ]
+
+
+class FastActivityLogSerializer(ValuesSerializer):
+    columns = ["id", "user_id", "action", "description", "created_at"]
+
+    def get_fields(self, rows):
+        users = load_users(row["user_id"] for row in rows)
+        return [
+            ("id", value("id")),
+            ("user", lookup("user_id", users)),
+            ("action", value("action")),
+            ("description", value("description")),
+            ("created_at", datetime("created_at")),
+        ]
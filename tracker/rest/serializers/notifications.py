@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from ...models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor = serializers.CharField(source="actor.username", default=None)
+    bug_title = serializers.CharField(source="bug.title", default=None)
+
+    class Meta:
+        model = Notification
+        fields = [
+            "id",
+            "kind",
+            "message",
+            "actor",
+            "project",
+            "bug",
+            "bug_title",
+            "is_read",
+            "created_at",
+        ]
+        read_only_fields = fields
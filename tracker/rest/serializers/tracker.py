@@ -1,4 +1,5 @@
 from core.models import User
+from django.conf import settings
 from rest_framework import serializers
 
 from ...models import ActivityLog, Bug, Comment, Project
@@ -12,7 +13,8 @@ class UserSerializer(serializers.ModelSerializer):
 
 class ProjectSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
-    members = UserSerializer(many=True, read_only=True)
+    members = serializers.SerializerMethodField()
+    member_count = serializers.SerializerMethodField()
     bug_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -23,11 +25,21 @@ class ProjectSerializer(serializers.ModelSerializer):
             "description",
             "owner",
             "members",
+            "member_count",
             "bug_count",
+            "version",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["created_at", "updated_at"]
+        read_only_fields = ["version", "created_at", "updated_at"]
+
+    def get_members(self, obj):
+        """A preview: the first page of /members/, capped at the preview size."""
+        users = obj.members.order_by("id")[: settings.PROJECT_MEMBER_PREVIEW_SIZE]
+        return UserSerializer(users, many=True).data
+
+    def get_member_count(self, obj):
+        return obj.members.count()
 
     def get_bug_count(self, obj):
         return obj.bugs.count()
@@ -50,12 +62,34 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class BugSerializer(serializers.ModelSerializer):
+class BugFieldsSerializer(serializers.ModelSerializer):
+    """Bug without its comments, used for bug_update deltas."""
+
     created_by = UserSerializer(read_only=True)
     assigned_to = UserSerializer(read_only=True)
     project_name = serializers.CharField(source="project.name", read_only=True)
+
+    class Meta:
+        model = Bug
+        fields = [
+            "id",
+            "title",
+            "description",
+            "status",
+            "priority",
+            "assigned_to",
+            "project",
+            "project_name",
+            "created_by",
+            "version",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["version", "created_at", "updated_at"]
+
+
+class BugSerializer(BugFieldsSerializer):
     comments = CommentSerializer(many=True, read_only=True)
-    comment_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Bug
@@ -71,13 +105,11 @@ class BugSerializer(serializers.ModelSerializer):
             "created_by",
             "comments",
             "comment_count",
+            "version",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["created_at", "updated_at"]
-
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+        read_only_fields = ["comment_count", "version", "created_at", "updated_at"]
 
     def create(self, validated_data):
         validated_data["created_by"] = self.context["request"].user
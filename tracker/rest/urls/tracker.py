@@ -1,14 +1,19 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from ..views import tracker
+from ..views import deletion, notifications, sync, tracker
 
 router = DefaultRouter()
 router.register(r"projects", tracker.ProjectViewSet, basename="project")
 router.register(r"bugs", tracker.BugViewSet, basename="bug")
 router.register(r"comments", tracker.CommentViewSet, basename="comment")
 router.register(r"activities", tracker.ActivityLogViewSet, basename="activity")
+router.register(
+    r"notifications", notifications.NotificationViewSet, basename="notification"
+)
+router.register(r"deletion-jobs", deletion.DeletionJobViewSet, basename="deletion-job")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("sync/", sync.SyncView.as_view(), name="sync"),
 ]
@@ -0,0 +1,15 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from ...models import DeletionJob
+from ..serializers.deletion import DeletionJobSerializer
+
+
+class DeletionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of the deletions the user requested"""
+
+    serializer_class = DeletionJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return DeletionJob.objects.filter(requested_by=self.request.user)
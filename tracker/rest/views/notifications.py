@@ -0,0 +1,66 @@
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from common.mixins import ReplicaReadMixin
+
+from ...models import Notification
+from ...notifications import forget_unread_count, get_unread_count
+from ..serializers.notifications import NotificationSerializer
+
+
+class NotificationPagination(CursorPagination):
+    ordering = "-id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class NotificationViewSet(
+    ReplicaReadMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+):
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        notifications = Notification.objects.filter(
+            recipient=self.request.user
+        ).select_related("actor", "bug")
+        if self.request.query_params.get("unread") in ("1", "true"):
+            notifications = notifications.filter(is_read=False)
+        return notifications
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data["unread_count"] = get_unread_count(request.user)
+        return response
+
+    @action(detail=False, methods=["get"])
+    def unread_count(self, request):
+        return Response({"unread_count": get_unread_count(request.user)})
+
+    @action(detail=False, methods=["post"])
+    def mark_read(self, request):
+        """Marks the notifications in "ids" as read, or all of them."""
+        notifications = Notification.objects.filter(
+            recipient=request.user, is_read=False
+        )
+        ids = request.data.get("ids")
+        if ids is not None:
+            if not isinstance(ids, list) or not all(
+                type(notification_id) is int for notification_id in ids
+            ):
+                return Response(
+                    {"error": "ids must be a list of integers"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            notifications = notifications.filter(id__in=ids)
+        updated = notifications.update(is_read=True)
+        if updated:
+            forget_unread_count(request.user)
+        return Response(
+            {"updated": updated, "unread_count": get_unread_count(request.user)}
+        )
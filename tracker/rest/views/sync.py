@@ -0,0 +1,58 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.mixins import ReplicaReadMixin
+
+from ...models import Project
+from ...sync import SyncTokenExpired, changes_since
+from .tracker import visible_project_ids
+
+
+def _int_param(request, name, default):
+    raw = request.query_params.get(name)
+    if raw in (None, ""):
+        if default is None:
+            raise ValidationError({name: "This parameter is required."})
+        return default
+    try:
+        number = int(raw)
+    except ValueError:
+        raise ValidationError({name: "Expected an integer."})
+    if number < 0:
+        raise ValidationError({name: "Expected a non-negative integer."})
+    return number
+
+
+class SyncView(ReplicaReadMixin, APIView):
+    """
+    Bugs, comments and members of a project changed after the ``since``
+    token, with tombstones for deletions. Pass back ``next`` until
+    ``has_more`` is false; a 410 means the token expired and the client
+    must reload the project.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "sync"
+
+    def get(self, request, format=None):
+        project_id = _int_param(request, "project", None)
+        since = _int_param(request, "since", 0)
+        limit = min(
+            _int_param(request, "limit", settings.SYNC_BATCH_SIZE) or 1,
+            settings.SYNC_MAX_BATCH_SIZE,
+        )
+        project = get_object_or_404(
+            Project.objects.filter(id__in=visible_project_ids(request)), pk=project_id
+        )
+        try:
+            return Response(changes_since(project, since, limit))
+        except SyncTokenExpired:
+            return Response(
+                {"error": "Sync token expired, reload the project", "reset": True},
+                status=status.HTTP_410_GONE,
+            )
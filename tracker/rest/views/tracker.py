@@ -1,23 +1,96 @@
 from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.conf import settings
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from ...models import ActivityLog, Bug, Comment, Project
+from common.batch import request_cache
+from common.mixins import ReplicaReadMixin, ValuesListMixin, VersionedUpdateMixin
+
+from ...activity import log_activity
+from ...deletion import schedule_bug_deletion, schedule_project_deletion
+from ...metrics import broadcast
+from ...models import ActivityLog, Bug, Comment, Project, WorkQueueEntry
+from ...notifications import notify
+from ...presence import get_presence_store
+from ..serializers.deletion import DeletionJobSerializer
+from ..serializers.fast import (
+    FastActivityLogSerializer,
+    FastBugFieldsSerializer,
+    FastBugSerializer,
+    FastCommentSerializer,
+    FastProjectSerializer,
+)
 from ..serializers.tracker import (
     ActivityLogSerializer,
+    BugFieldsSerializer,
     BugSerializer,
     CommentSerializer,
     ProjectSerializer,
+    UserSerializer,
 )
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+def visible_project_ids(request):
+    """
+    The projects the user owns or belongs to, looked up once per request
+    and once per /api/batch/ call. Filtering on the ids spares every
+    queryset below the membership join and its DISTINCT.
+    """
+    user = request.user
+    return request_cache(request).get_or_compute(
+        "visible_project_ids",
+        lambda: list(
+            Project.objects.filter(Q(owner=user) | Q(members=user))
+            .order_by()
+            .values_list("id", flat=True)
+            .distinct()
+        ),
+    )
+
+
+def visible_bugs(request):
+    return Bug.objects.filter(
+        Q(project_id__in=visible_project_ids(request)) | Q(created_by=request.user)
+    )
+
+
+class CommentPagination(CursorPagination):
+    """Newest comments first; "previous" pages forward to newer ones."""
+
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class WorkQueuePagination(CursorPagination):
+    """Most urgent first, then oldest; see tracker.work_queue."""
+
+    ordering = "sort_key"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class MemberPagination(CursorPagination):
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class ProjectViewSet(
+    ReplicaReadMixin, ValuesListMixin, VersionedUpdateMixin, viewsets.ModelViewSet
+):
     serializer_class = ProjectSerializer
+    values_serializer_class = FastProjectSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name", "description"]
@@ -25,12 +98,49 @@ class ProjectViewSet(viewsets.ModelViewSet):
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        user = self.request.user
-        return Project.objects.filter(Q(owner=user) | Q(members=user)).distinct()
+        return Project.objects.filter(id__in=visible_project_ids(self.request))
+
+    def perform_update(self, serializer):
+        self.save_versioned(serializer)
+
+    def destroy(self, request, *args, **kwargs):
+        """Hides the project now; a DeletionJob removes its rows later."""
+        job = schedule_project_deletion(self.get_object(), request.user)
+        return Response(
+            DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=["get"])
+    def presence(self, request, pk=None):
+        """Users with an open WebSocket on the project"""
+        project = self.get_object()
+        from core.models import User
+
+        user_ids = async_to_sync(get_presence_store().online)(project.id)
+        users = User.objects.filter(id__in=user_ids).order_by("username")
+        return Response(
+            {"count": len(user_ids), "users": UserSerializer(users, many=True).data}
+        )
+
+    # No filter backends: CursorPagination would take OrderingFilter's order
+    @action(
+        detail=True,
+        methods=["get"],
+        pagination_class=MemberPagination,
+        filter_backends=[],
+    )
+    def members(self, request, pk=None):
+        """All project members, keyset-paginated by id"""
+        project = self.get_object()
+        members = project.members.only(*UserSerializer.Meta.fields)
+        page = self.paginate_queryset(members)
+        return self.get_paginated_response(UserSerializer(page, many=True).data)
 
     @action(detail=True, methods=["post"])
     def add_member(self, request, pk=None):
         project = self.get_object()
+        if "usernames" in request.data:
+            return self._change_members(project.members.add, "added")
         username = request.data.get("username")
 
         try:
@@ -47,6 +157,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["delete"])
     def remove_member(self, request, pk=None):
         project = self.get_object()
+        if "usernames" in request.data:
+            return self._change_members(project.members.remove, "removed")
         username = request.data.get("username")
 
         try:
@@ -60,9 +172,36 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
+    def _change_members(self, change, done):
+        """Adds or removes every user in "usernames" with one lookup query."""
+        from core.models import User
+
+        usernames = self.request.data["usernames"]
+        if not isinstance(usernames, list) or not all(
+            isinstance(username, str) for username in usernames
+        ):
+            raise ValidationError({"usernames": "Expected a list of usernames."})
+        if len(usernames) > settings.PROJECT_MEMBER_BULK_LIMIT:
+            raise ValidationError(
+                {
+                    "usernames": f"At most {settings.PROJECT_MEMBER_BULK_LIMIT}"
+                    " usernames per request."
+                }
+            )
+
+        users = list(User.objects.filter(username__in=usernames).only("id", "username"))
+        change(*users)
+        found = {user.username for user in users}
+        return Response(
+            {done: sorted(found), "not_found": sorted(set(usernames) - found)}
+        )
+
 
-class BugViewSet(viewsets.ModelViewSet):
+class BugViewSet(
+    ReplicaReadMixin, ValuesListMixin, VersionedUpdateMixin, viewsets.ModelViewSet
+):
     serializer_class = BugSerializer
+    values_serializer_class = FastBugSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [
         DjangoFilterBackend,
@@ -75,114 +214,223 @@ class BugViewSet(viewsets.ModelViewSet):
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        user = self.request.user
-        return Bug.objects.filter(
-            Q(project__owner=user) | Q(project__members=user) | Q(created_by=user)
-        ).distinct()
+        return visible_bugs(self.request)
 
     def perform_create(self, serializer):
         bug = serializer.save()
         self._log_activity(bug, "created", f'Bug "{bug.title}" was created')
         self._send_websocket_update(bug, "bug_created")
+        if bug.assigned_to_id:
+            self._notify_assignee(bug)
 
     def perform_update(self, serializer):
-        old_bug = Bug.objects.get(pk=serializer.instance.pk)
-        bug = serializer.save()
+        bug = serializer.instance
+        self.check_version(bug)
+        if all(
+            getattr(bug, field) == value
+            for field, value in serializer.validated_data.items()
+        ):
+            return
+
+        before = BugFieldsSerializer(bug).data
+        bug = self.save_versioned(serializer)
+        after = BugFieldsSerializer(bug).data
+        delta = {
+            field: value
+            for field, value in after.items()
+            if before[field] != value and field != "version"
+        }
 
         # Log specific changes
         changes = []
-        if old_bug.status != bug.status:
-            changes.append(f"status changed from {old_bug.status} to {bug.status}")
-        if old_bug.assigned_to != bug.assigned_to:
+        if "status" in delta:
+            changes.append(
+                f"status changed from {before['status']} to {after['status']}"
+            )
+        if "assigned_to" in delta:
             old_assignee = (
-                old_bug.assigned_to.username if old_bug.assigned_to else "Unassigned"
+                before["assigned_to"]["username"]
+                if before["assigned_to"]
+                else "Unassigned"
+            )
+            new_assignee = (
+                after["assigned_to"]["username"]
+                if after["assigned_to"]
+                else "Unassigned"
             )
-            new_assignee = bug.assigned_to.username if bug.assigned_to else "Unassigned"
             changes.append(f"assigned from {old_assignee} to {new_assignee}")
 
         if changes:
             description = f'Bug "{bug.title}" - {", ".join(changes)}'
             self._log_activity(bug, "updated", description)
-            self._send_websocket_update(bug, "bug_updated")
+        self._send_websocket_update(bug, "bug_updated", delta)
+
+        if "assigned_to" in delta and bug.assigned_to_id:
+            self._notify_assignee(bug)
+        if "status" in delta:
+            notify(
+                "status_changed",
+                [bug.created_by_id, bug.assigned_to_id],
+                self.request.user,
+                bug,
+                f'"{bug.title}" moved from {before["status"]} to {after["status"]}',
+            )
+
+    @action(
+        detail=True,
+        methods=["get"],
+        pagination_class=CommentPagination,
+        filter_backends=[],
+    )
+    def comments(self, request, pk=None):
+        """Comments on the bug, paginated newest first"""
+        # The bug's visibility is checked once; comments need no join
+        bug = self.get_object()
+        comments = Comment.objects.filter(bug=bug).select_related("commenter")
+        page = self.paginate_queryset(comments)
+        serializer = CommentSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["post"])
+    def bulk_delete(self, request):
+        """Hides the bugs in "ids" now; a DeletionJob removes their rows later."""
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({"ids": "Expected a list of bug ids."})
+        if len(ids) > settings.DELETION_BULK_BUG_LIMIT:
+            raise ValidationError(
+                {"ids": f"At most {settings.DELETION_BULK_BUG_LIMIT} bugs per request."}
+            )
+        try:
+            ids = {int(bug_id) for bug_id in ids}
+        except (TypeError, ValueError):
+            raise ValidationError({"ids": "Expected a list of bug ids."})
+
+        bugs = self.get_queryset().filter(id__in=ids).values_list("id", "project_id")
+        by_project = {}
+        for bug_id, project_id in bugs:
+            by_project.setdefault(project_id, []).append(bug_id)
+        jobs = [
+            schedule_bug_deletion(project_id, bug_ids, request.user)
+            for project_id, bug_ids in sorted(by_project.items())
+        ]
+        found = {bug_id for bug_ids in by_project.values() for bug_id in bug_ids}
+        return Response(
+            {
+                "jobs": DeletionJobSerializer(jobs, many=True).data,
+                "not_found": sorted(ids - found),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
     @action(detail=False, methods=["get"])
     def my_bugs(self, request):
         """Get bugs assigned to the current user"""
         bugs = self.get_queryset().filter(assigned_to=request.user)
-        serializer = self.get_serializer(bugs, many=True)
-        return Response(serializer.data)
+        return Response(FastBugSerializer(bugs).data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        pagination_class=WorkQueuePagination,
+        filter_backends=[],
+    )
+    def work_queue(self, request):
+        """Open bugs assigned to the current user, most urgent and oldest first"""
+        entries = WorkQueueEntry.objects.filter(
+            user=request.user, project_id__in=visible_project_ids(request)
+        ).values("bug_id", "sort_key")
+        page = self.paginate_queryset(entries)
+        bug_ids = [entry["bug_id"] for entry in page]
+        bugs = {
+            bug["id"]: bug
+            for bug in FastBugFieldsSerializer(
+                Bug.objects.filter(id__in=bug_ids).order_by()
+            ).data
+        }
+        return self.get_paginated_response(
+            [bugs[bug_id] for bug_id in bug_ids if bug_id in bugs]
+        )
 
-    def _log_activity(self, bug, action, description):
-        ActivityLog.objects.create(
-            project=bug.project,
-            bug=bug,
-            user=self.request.user,
-            action=action,
-            description=description,
+    def _notify_assignee(self, bug):
+        notify(
+            "assigned",
+            [bug.assigned_to_id],
+            self.request.user,
+            bug,
+            f'{self.request.user.username} assigned "{bug.title}" to you',
         )
 
-    def _send_websocket_update(self, bug, event_type):
-        channel_layer = get_channel_layer()
+    def _log_activity(self, bug, action, description):
+        log_activity(bug.project, bug, self.request.user, action, description)
+
+    def _send_websocket_update(self, bug, event_type, changes=None):
+        """
+        Broadcasts a bug event. Updates carry only the changed fields and
+        the new version; clients whose version doesn't follow on request a
+        full bug_snapshot over the socket.
+        """
         group_name = f"project_{bug.project.id}"
+        message = {
+            "type": "bug_update",
+            "event_type": event_type,
+            "bug_id": bug.id,
+            "version": bug.version,
+        }
+        if changes is None:
+            message["data"] = BugSerializer(bug).data
+        else:
+            message["changes"] = changes
 
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "bug_update",
-                "event_type": event_type,
-                "bug_id": bug.id,
-                "data": BugSerializer(bug).data,
-            },
-        )
+        broadcast(group_name, message)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    values_serializer_class = FastCommentSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         bug_id = self.request.query_params.get("bug_id")
         if bug_id:
-            return Comment.objects.filter(bug_id=bug_id)
+            bug = get_object_or_404(visible_bugs(self.request), pk=bug_id)
+            return Comment.objects.filter(bug=bug).select_related("commenter")
 
-        user = self.request.user
         return Comment.objects.filter(
-            Q(bug__project__owner=user) | Q(bug__project__members=user)
-        ).distinct()
+            bug__project_id__in=visible_project_ids(self.request),
+            bug__deleted_at__isnull=True,
+        ).select_related("commenter")
 
     def perform_create(self, serializer):
         bug_id = self.request.data.get("bug_id")
         if not bug_id:
-            return Response(
-                {"error": "bug_id is required"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            bug = Bug.objects.get(id=bug_id)
-            comment = serializer.save(bug=bug)
-
-            # Log activity
-            ActivityLog.objects.create(
-                project=bug.project,
-                bug=bug,
-                user=self.request.user,
-                action="commented",
-                description=f'Comment added to bug "{bug.title}"',
-            )
-
-            # Send WebSocket notification
-            self._send_comment_notification(comment)
+            raise ValidationError({"bug_id": "This field is required."})
+        bug = get_object_or_404(visible_bugs(self.request), pk=bug_id)
+        comment = serializer.save(bug=bug)
+
+        # Log activity
+        log_activity(
+            bug.project,
+            bug,
+            self.request.user,
+            "commented",
+            f'Comment added to bug "{bug.title}"',
+        )
 
-        except Bug.DoesNotExist:
-            return Response(
-                {"error": "Bug not found"}, status=status.HTTP_404_NOT_FOUND
-            )
+        # Send WebSocket notification
+        self._send_comment_notification(comment)
+        notify(
+            "commented",
+            [bug.created_by_id, bug.assigned_to_id],
+            self.request.user,
+            bug,
+            f'{self.request.user.username} commented on "{bug.title}"',
+        )
 
     def _send_comment_notification(self, comment):
-        channel_layer = get_channel_layer()
         group_name = f"project_{comment.bug.project.id}"
 
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             group_name,
             {
                 "type": "comment_added",
@@ -192,15 +440,18 @@ class CommentViewSet(viewsets.ModelViewSet):
         )
 
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(
+    ReplicaReadMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet
+):
     serializer_class = ActivityLogSerializer
+    values_serializer_class = FastActivityLogSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["project", "action"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        user = self.request.user
+        # Hidden projects aren't among the visible ones
         return ActivityLog.objects.filter(
-            Q(project__owner=user) | Q(project__members=user)
-        ).distinct()
+            project_id__in=visible_project_ids(self.request)
+        ).exclude(bug__deleted_at__isnull=False)
@@ -0,0 +1,267 @@
+"""
+Change log behind /api/sync/.
+
+Every change to a bug, comment or project membership appends a SyncChange
+numbered from its project's SyncCounter; deletions append a tombstone. A
+client keeps the last number it saw as its sync token and asks for the
+changes after it, which is a range scan on (project, seq).
+"""
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Bug, Comment, Project, SyncChange, SyncCounter
+from .rest.serializers.fast import (
+    FastBugFieldsSerializer,
+    FastCommentSerializer,
+    load_users,
+)
+
+logger = logging.getLogger(__name__)
+
+_recording = ContextVar("sync_recording", default=True)
+
+
+@contextmanager
+def suspended():
+    """Skips recording, for rows whose tombstones were recorded when hidden."""
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+def next_seqs(project_id, count=1):
+    """Reserves ``count`` numbers; call inside the transaction using them."""
+    updated = SyncCounter.objects.filter(project_id=project_id).update(
+        seq=F("seq") + count
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                SyncCounter.objects.create(project_id=project_id, seq=count)
+            return range(1, count + 1)
+        except IntegrityError:
+            # Another writer created the counter first
+            return next_seqs(project_id, count)
+    last = SyncCounter.objects.values_list("seq", flat=True).get(project_id=project_id)
+    return range(last - count + 1, last + 1)
+
+
+def record_changes(project_id, kind, object_ids, deleted=False):
+    if not _recording.get():
+        return
+    with transaction.atomic():
+        seqs = next_seqs(project_id, len(object_ids))
+        SyncChange.objects.bulk_create(
+            SyncChange(
+                project_id=project_id,
+                seq=seq,
+                kind=kind,
+                object_id=object_id,
+                deleted=deleted,
+            )
+            for seq, object_id in zip(seqs, object_ids)
+        )
+
+
+def _cascaded_from(origin, *models):
+    """Whether a delete started at an instance or queryset of ``models``."""
+    return getattr(origin, "model", type(origin)) in models
+
+
+def bug_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    moved_from = getattr(instance, "_loaded_project_id", None)
+    moved = moved_from is not None and moved_from != instance.project_id
+    if moved:
+        record_changes(moved_from, "bug", [instance.pk], deleted=True)
+    instance._loaded_project_id = instance.project_id
+    record_changes(instance.project_id, "bug", [instance.pk])
+    if moved:
+        # The comments go with the bug: the new project's clients need them,
+        # and tombstones let compaction clear them out of the old log
+        comment_ids = list(
+            Comment.objects.filter(bug=instance)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if comment_ids:
+            record_changes(moved_from, "comment", comment_ids, deleted=True)
+            record_changes(instance.project_id, "comment", comment_ids)
+
+
+def bug_deleted(sender, instance, origin=None, **kwargs):
+    # The whole log goes with a deleted project
+    if not _cascaded_from(origin, Project):
+        record_changes(instance.project_id, "bug", [instance.pk], deleted=True)
+
+
+def comment_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(instance.bug.project_id, "comment", [instance.pk])
+
+
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # A deleted bug's tombstone stands for its comments; checking first
+    # also saves looking up the bug of each comment a DeletionJob removes
+    if _recording.get() and not _cascaded_from(origin, Project, Bug):
+        record_changes(instance.bug.project_id, "comment", [instance.pk], deleted=True)
+
+
+def members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # clear() sends no ids; the members are still there to list
+        related = instance.projects if reverse else instance.members
+        action, pk_set = "post_remove", set(related.values_list("pk", flat=True))
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    deleted = action == "post_remove"
+    if reverse:
+        # user.projects.add(...): one membership in each project
+        for project_id in sorted(pk_set):
+            record_changes(project_id, "member", [instance.pk], deleted=deleted)
+    else:
+        record_changes(instance.pk, "member", sorted(pk_set), deleted=deleted)
+
+
+def connect_signals():
+    post_save.connect(bug_saved, sender=Bug, dispatch_uid="tracker.sync.bug_saved")
+    post_delete.connect(
+        bug_deleted, sender=Bug, dispatch_uid="tracker.sync.bug_deleted"
+    )
+    post_save.connect(
+        comment_saved, sender=Comment, dispatch_uid="tracker.sync.comment_saved"
+    )
+    post_delete.connect(
+        comment_deleted, sender=Comment, dispatch_uid="tracker.sync.comment_deleted"
+    )
+    m2m_changed.connect(
+        members_changed,
+        sender=Project.members.through,
+        dispatch_uid="tracker.sync.members_changed",
+    )
+
+
+class SyncTokenExpired(Exception):
+    pass
+
+
+def changes_since(project, since, limit):
+    """
+    The changes after ``since``, at most ``limit`` log entries, with only the
+    latest entry per object kept. Objects are serialized as they are now;
+    one deleted after the batch's last entry shows up as a tombstone.
+    """
+    pruned_seq = (
+        SyncCounter.objects.filter(project=project)
+        .values_list("pruned_seq", flat=True)
+        .first()
+    )
+    if since < (pruned_seq or 0):
+        raise SyncTokenExpired
+
+    entries = list(
+        SyncChange.objects.filter(project=project, seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for seq, kind, object_id, deleted in entries:
+        latest[kind, object_id] = deleted
+    changed = {"bug": [], "comment": [], "member": []}
+    deleted = {"bug": set(), "comment": set(), "member": set()}
+    for (kind, object_id), is_deleted in latest.items():
+        (deleted[kind].add if is_deleted else changed[kind].append)(object_id)
+
+    bugs = FastBugFieldsSerializer(
+        Bug.objects.filter(project=project, id__in=changed["bug"]).order_by("id")
+    )
+    bug_data = bugs.data
+    # Comments of hidden bugs are as good as deleted
+    comments = FastCommentSerializer(
+        Comment.objects.filter(
+            bug__project=project,
+            bug__deleted_at__isnull=True,
+            bug__project__deleted_at__isnull=True,
+            id__in=changed["comment"],
+        ).order_by("id")
+    )
+    comment_data = comments.data
+    for row, comment in zip(comments.rows, comment_data):
+        comment["bug"] = row["bug_id"]
+    member_ids = set(
+        project.members.filter(id__in=changed["member"]).values_list("id", flat=True)
+    )
+    users = load_users(member_ids)
+
+    deleted["bug"].update(set(changed["bug"]) - {bug["id"] for bug in bug_data})
+    deleted["comment"].update(
+        set(changed["comment"]) - {comment["id"] for comment in comment_data}
+    )
+    deleted["member"].update(set(changed["member"]) - member_ids)
+
+    return {
+        "since": str(since),
+        "next": str(entries[-1][0] if entries else since),
+        "has_more": has_more,
+        "bugs": bug_data,
+        "comments": comment_data,
+        "members": [users[user_id] for user_id in sorted(member_ids)],
+        "deleted": {
+            "bugs": sorted(deleted["bug"]),
+            "comments": sorted(deleted["comment"]),
+            "members": sorted(deleted["member"]),
+        },
+    }
+
+
+def compact(tombstone_before):
+    """
+    Drops entries superseded by a later entry for the same object, then
+    tombstones older than ``tombstone_before``. Projects whose tombstones
+    were dropped record the highest dropped number, so older tokens reload.
+    Returns (superseded, tombstones) counts.
+    """
+    later = SyncChange.objects.filter(
+        project=OuterRef("project"),
+        kind=OuterRef("kind"),
+        object_id=OuterRef("object_id"),
+        seq__gt=OuterRef("seq"),
+    )
+    superseded, _ = SyncChange.objects.filter(Exists(later)).delete()
+
+    tombstones = SyncChange.objects.filter(
+        deleted=True, created_at__lt=tombstone_before
+    )
+    dropped = 0
+    for project_id, last_seq in (
+        tombstones.order_by()
+        .values("project_id")
+        .annotate(last_seq=Max("seq"))
+        .values_list("project_id", "last_seq")
+    ):
+        with transaction.atomic():
+            SyncCounter.objects.filter(
+                project_id=project_id, pruned_seq__lt=last_seq
+            ).update(pruned_seq=last_seq)
+            count, _ = tombstones.filter(
+                project_id=project_id, seq__lte=last_seq
+            ).delete()
+        dropped += count
+    logger.info(
+        "Compacted the sync log: %s superseded entries, %s tombstones",
+        superseded,
+        dropped,
+    )
+    return superseded, dropped
@@ -1,3 +1,614 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from common.mixins import PreconditionFailed
+from core.models import User
+
+from .activity import log_activity
+from .deletion import (
+    claim_job,
+    run_job,
+    schedule_bug_deletion,
+    schedule_project_deletion,
+)
+from .models import (
+    ActivityLog,
+    Bug,
+    Comment,
+    DeletionJob,
+    Notification,
+    Project,
+    SyncChange,
+    SyncCounter,
+    WorkQueueEntry,
+)
+from .outbox import Outbox, OutboxOverflow, SendWindow
+from .rest.serializers.fast import (
+    FastActivityLogSerializer,
+    FastBugSerializer,
+    FastCommentSerializer,
+    FastProjectSerializer,
+)
+from .rest.serializers.tracker import (
+    ActivityLogSerializer,
+    BugSerializer,
+    CommentSerializer,
+    ProjectSerializer,
+)
+from .rest.views.tracker import BugViewSet
+from .sync import SyncTokenExpired, changes_since, compact
+
+
+class FastSerializerTests(TestCase):
+    """The .values() serializers must render exactly like the ModelSerializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(
+            email="owner@example.com", username="owner", first_name="Ada"
+        )
+        member = User.objects.create_user(email="member@example.com", username="m")
+        other = User.objects.create_user(email="other@example.com", username="o")
+        project = Project.objects.create(name="Tracker", owner=owner)
+        project.members.add(member, other)
+        Project.objects.create(name="Empty", description="No bugs", owner=member)
+
+        assigned = Bug.objects.create(
+            title="Crash",
+            description="On save",
+            project=project,
+            created_by=owner,
+            assigned_to=member,
+            priority="High",
+        )
+        Bug.objects.create(
+            title="Typo", description="", project=project, created_by=member
+        )
+        for i, commenter in enumerate([member, owner, member]):
+            Comment.objects.create(
+                bug=assigned, commenter=commenter, message=f"Comment {i}"
+            )
+        log_activity(project, assigned, owner, "created", "Bug created")
+        log_activity(project, None, member, "updated", "Project updated")
+
+    def assertRendersLike(self, serializer_class, fast_serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = fast_serializer_class(queryset).data
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_projects(self):
+        self.assertRendersLike(
+            ProjectSerializer, FastProjectSerializer, Project.objects.all()
+        )
+
+    @override_settings(PROJECT_MEMBER_PREVIEW_SIZE=1)
+    def test_projects_member_preview(self):
+        self.assertRendersLike(
+            ProjectSerializer, FastProjectSerializer, Project.objects.all()
+        )
+
+    def test_bugs(self):
+        self.assertRendersLike(BugSerializer, FastBugSerializer, Bug.objects.all())
+
+    def test_comments(self):
+        self.assertRendersLike(
+            CommentSerializer, FastCommentSerializer, Comment.objects.all()
+        )
+
+    def test_activity(self):
+        self.assertRendersLike(
+            ActivityLogSerializer, FastActivityLogSerializer, ActivityLog.objects.all()
+        )
+
+    def test_empty_querysets(self):
+        self.assertRendersLike(BugSerializer, FastBugSerializer, Bug.objects.none())
+        self.assertRendersLike(
+            ProjectSerializer, FastProjectSerializer, Project.objects.none()
+        )
+
+
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email="owner@example.com", username="o")
+        cls.project = Project.objects.create(name="Tracker", owner=cls.owner)
+        cls.other = Project.objects.create(name="Other", owner=cls.owner)
+
+    def create_bug(self, title="Crash"):
+        return Bug.objects.create(
+            title=title, description="", project=self.project, created_by=self.owner
+        )
+
+    def comment(self, bug, message="Seen it"):
+        return Comment.objects.create(bug=bug, commenter=self.owner, message=message)
+
+    def changed_ids(self, changes):
+        return (
+            [bug["id"] for bug in changes["bugs"]],
+            [comment["id"] for comment in changes["comments"]],
+        )
+
+    def test_latest_entry_per_object(self):
+        bug = self.create_bug()
+        comment = self.comment(bug)
+        bug.title = "Crash on save"
+        bug.save()
+
+        changes = changes_since(self.project, 0, 100)
+        self.assertEqual(self.changed_ids(changes), ([bug.id], [comment.id]))
+        self.assertEqual(changes["bugs"][0]["title"], "Crash on save")
+        self.assertEqual(changes["comments"][0]["bug"], bug.id)
+        self.assertFalse(changes["has_more"])
+
+        later = changes_since(self.project, int(changes["next"]), 100)
+        self.assertEqual(self.changed_ids(later), ([], []))
+        self.assertEqual(later["next"], changes["next"])
+
+    def test_limit_pages_through_the_log(self):
+        bugs = [self.create_bug(f"Bug {i}") for i in range(3)]
+
+        first = changes_since(self.project, 0, 2)
+        self.assertTrue(first["has_more"])
+        rest = changes_since(self.project, int(first["next"]), 2)
+        self.assertFalse(rest["has_more"])
+        self.assertEqual(
+            self.changed_ids(first)[0] + self.changed_ids(rest)[0],
+            [bug.id for bug in bugs],
+        )
+
+    def test_deleted_comment(self):
+        comment = self.comment(self.create_bug())
+        comment_id = comment.id
+        comment.delete()
+
+        changes = changes_since(self.project, 0, 100)
+        self.assertEqual(changes["comments"], [])
+        self.assertEqual(changes["deleted"]["comments"], [comment_id])
+
+    def test_comments_of_hidden_bug_are_deleted(self):
+        bug = self.create_bug()
+        comment = self.comment(bug)
+        schedule_bug_deletion(self.project.id, [bug.id], self.owner)
+
+        changes = changes_since(self.project, 0, 100)
+        self.assertEqual(self.changed_ids(changes), ([], []))
+        self.assertEqual(changes["deleted"]["bugs"], [bug.id])
+        self.assertEqual(changes["deleted"]["comments"], [comment.id])
+
+    def test_moved_bug_takes_its_comments(self):
+        bug = self.create_bug()
+        comments = [self.comment(bug), self.comment(bug, "Me too")]
+        comment_ids = [comment.id for comment in comments]
+        token = int(changes_since(self.project, 0, 100)["next"])
+
+        bug = Bug.objects.get(pk=bug.pk)
+        bug.project = self.other
+        bug.save()
+
+        left = changes_since(self.project, token, 100)
+        self.assertEqual(self.changed_ids(left), ([], []))
+        self.assertEqual(left["deleted"]["bugs"], [bug.id])
+        self.assertEqual(left["deleted"]["comments"], comment_ids)
+
+        arrived = changes_since(self.other, 0, 100)
+        self.assertEqual(self.changed_ids(arrived), ([bug.id], comment_ids))
+
+    def test_compact_drops_superseded_entries(self):
+        bug = self.create_bug()
+        bug.save()
+        bug.save()
+
+        superseded, tombstones = compact(timezone.now() - timedelta(days=1))
+        self.assertEqual((superseded, tombstones), (2, 0))
+        self.assertEqual(SyncChange.objects.filter(project=self.project).count(), 1)
+        self.assertEqual(
+            self.changed_ids(changes_since(self.project, 0, 100)), ([bug.id], [])
+        )
+
+    def test_compact_expires_tombstones(self):
+        kept = self.create_bug("Kept")
+        comment = self.comment(self.create_bug("Deleted"))
+        comment.delete()
+        last_seq = SyncCounter.objects.get(project=self.project).seq
+
+        superseded, tombstones = compact(timezone.now() + timedelta(seconds=1))
+        self.assertEqual((superseded, tombstones), (1, 1))
+        counter = SyncCounter.objects.get(project=self.project)
+        self.assertEqual(counter.pruned_seq, last_seq)
+
+        with self.assertRaises(SyncTokenExpired):
+            changes_since(self.project, 0, 100)
+        self.assertEqual(
+            self.changed_ids(changes_since(self.project, last_seq, 100)), ([], [])
+        )
+        self.assertTrue(
+            SyncChange.objects.filter(
+                project=self.project, kind="bug", object_id=kept.id
+            ).exists()
+        )
+
+
+class Interrupted(BaseException):
+    """Stops run_job the way a killed worker would, without marking it failed."""
+
+
+class DeletionJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email="owner@example.com", username="o")
+        cls.project = Project.objects.create(name="Tracker", owner=cls.owner)
+        cls.bugs = [
+            Bug.objects.create(
+                title=f"Bug {i}",
+                description="",
+                project=cls.project,
+                created_by=cls.owner,
+            )
+            for i in range(3)
+        ]
+        for bug in cls.bugs:
+            Comment.objects.create(bug=bug, commenter=cls.owner, message="Seen it")
+
+    def make_stale(self, job):
+        DeletionJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(days=1)
+        )
+
+    def test_deletes_project(self):
+        schedule_project_deletion(self.project, self.owner)
+        job = run_job(claim_job(), batch_size=2)
+
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.progress, {k: v for k, v in job.totals.items() if v})
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Bug.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertIsNone(claim_job())
+
+    def test_deletes_bugs(self):
+        doomed = [bug.id for bug in self.bugs[:2]]
+        schedule_bug_deletion(self.project.id, doomed, self.owner)
+        self.assertEqual(
+            list(Bug.objects.values_list("id", flat=True)), [self.bugs[2].id]
+        )
+
+        job = run_job(claim_job(), batch_size=1)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.progress, {"comments": 2, "bugs": 2})
+        self.assertEqual(
+            list(Bug.all_objects.values_list("id", flat=True)), [self.bugs[2].id]
+        )
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_resumes_after_worker_died(self):
+        schedule_project_deletion(self.project, self.owner)
+
+        def die_after_first_batch(job, step):
+            raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            run_job(claim_job(), batch_size=2, report=die_after_first_batch)
+        self.assertIsNone(claim_job())
+
+        self.make_stale(DeletionJob.objects.get())
+        job = claim_job()
+        self.assertEqual(job.progress, {"comments": 2})
+        job = run_job(job, batch_size=2)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.progress["comments"], 3)
+        self.assertFalse(Bug.all_objects.exists())
+
+    def test_stalled_worker_stops_after_takeover(self):
+        schedule_project_deletion(self.project, self.owner)
+        taken_over = []
+
+        def stall_after_first_batch(job, step):
+            if not taken_over:
+                self.make_stale(job)
+                taken_over.append(claim_job())
+
+        with self.assertLogs("tracker.deletion", "WARNING"):
+            stalled = run_job(claim_job(), 2, report=stall_after_first_batch)
+        self.assertEqual(stalled.progress, {"comments": 2})
+        self.assertEqual(Comment.objects.count(), 1)
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.status, job.worker), ("running", taken_over[0].worker))
+        self.assertNotEqual(job.worker, stalled.worker)
+
+        self.assertEqual(run_job(taken_over[0], batch_size=2).status, "done")
+        self.assertFalse(Project.all_objects.exists())
+
+
+# Updates are broadcast; keep that off Redis
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class VersionedUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email="owner@example.com", username="o")
+        cls.project = Project.objects.create(name="Tracker", owner=cls.owner)
+        cls.bug = Bug.objects.create(
+            title="Crash", description="", project=cls.project, created_by=cls.owner
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def patch(self, data, **headers):
+        return self.client.patch(
+            f"/api/bugs/{self.bug.id}/", data, format="json", headers=headers
+        )
+
+    def test_update_bumps_version(self):
+        response = self.patch({"status": "In Progress"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(response["ETag"], '"2"')
+
+        response = self.patch({"status": "Resolved"}, If_Match='"2"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 3)
+        self.assertEqual(response["ETag"], '"3"')
+        bug = Bug.objects.get(pk=self.bug.pk)
+        self.assertEqual((bug.status, bug.version), ("Resolved", 3))
+
+    def test_edit_keeps_comments_added_meanwhile(self):
+        loaded = Bug.objects.get(pk=self.bug.pk)
+        Comment.objects.create(bug=self.bug, commenter=self.owner, message="Hi")
+        loaded.title = "Crash on save"
+        loaded.save()
+        self.assertEqual(Bug.objects.get(pk=self.bug.pk).comment_count, 1)
+
+        response = self.patch({"title": "Crash on load"}, If_Match='"1"')
+        self.assertEqual(response.status_code, 200)
+        Comment.objects.create(bug=self.bug, commenter=self.owner, message="Again")
+        response = self.patch({"status": "Resolved"})
+        self.assertEqual(response.status_code, 200)
+        bug = Bug.objects.get(pk=self.bug.pk)
+        self.assertEqual(
+            (bug.title, bug.status, bug.comment_count), ("Crash on load", "Resolved", 2)
+        )
+
+    def test_stale_if_match_fails(self):
+        self.patch({"status": "In Progress"})
+        response = self.patch({"status": "Resolved"}, If_Match='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data["version"], 2)
+        bug = Bug.objects.get(pk=self.bug.pk)
+        self.assertEqual((bug.status, bug.version), ("In Progress", 2))
+
+    def stale_save(self):
+        """A view that loaded the bug just before someone else saved it."""
+        request = APIRequestFactory().patch("/", HTTP_IF_MATCH='"1"')
+        view = BugViewSet(request=request, format_kwarg=None)
+        stale = Bug.objects.get(pk=self.bug.pk)
+        Bug.objects.filter(pk=self.bug.pk).update(version=2)
+        serializer = BugSerializer(
+            stale,
+            data={"status": "Resolved"},
+            partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        return view, serializer
+
+    def test_concurrent_update_fails(self):
+        view, serializer = self.stale_save()
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(PreconditionFailed) as raised:
+                view.save_versioned(serializer)
+        self.assertEqual(raised.exception.detail["version"], 2)
+        self.assertEqual(Bug.objects.get(pk=self.bug.pk).status, "Open")
+
+        # The claim is a plain compare-and-set on the row
+        claim = next(q["sql"] for q in queries if q["sql"].startswith("UPDATE"))
+        self.assertNotIn("JOIN", claim)
+        self.assertNotIn("deleted_at", claim)
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="user@example.com", username="u")
+        project = Project.objects.create(name="Tracker", owner=cls.user)
+        cls.notifications = [
+            Notification.objects.create(
+                recipient=cls.user, project=project, kind="commented", message=str(i)
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def mark_read(self, data):
+        return self.client.post("/api/notifications/mark_read/", data, format="json")
+
+    def test_mark_read_by_id(self):
+        response = self.mark_read({"ids": [self.notifications[0].id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"updated": 1, "unread_count": 2})
+
+    def test_mark_read_all(self):
+        response = self.mark_read({})
+        self.assertEqual(response.data, {"updated": 3, "unread_count": 0})
+
+    def test_mark_read_rejects_bad_ids(self):
+        for ids in (["x"], [1, "2"], [None], [True], "1"):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.mark_read({"ids": ids}).status_code, 400)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 3)
+
+
+class WorkQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="user@example.com", username="u")
+        cls.other = User.objects.create_user(email="other@example.com", username="o")
+        cls.project = Project.objects.create(name="Tracker", owner=cls.user)
+        cls.project.members.add(cls.other)
+        cls.bugs = [
+            Bug.objects.create(
+                title=priority,
+                description="",
+                priority=priority,
+                project=cls.project,
+                created_by=cls.user,
+                assigned_to=cls.user,
+            )
+            for priority in ("Low", "Critical", "Medium", "Critical", "High")
+        ]
+
+    def queue(self, user):
+        return list(
+            WorkQueueEntry.objects.filter(user=user).values_list("bug_id", flat=True)
+        )
+
+    def test_most_urgent_then_oldest_first(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/bugs/work_queue/")
+        self.assertEqual(response.status_code, 200)
+        low, critical, medium, later_critical, high = self.bugs
+        self.assertEqual(
+            [bug["id"] for bug in response.data["results"]],
+            [bug.id for bug in (critical, later_critical, high, medium, low)],
+        )
+
+    def test_bulk_update_keeps_queues_current(self):
+        low, critical = self.bugs[:2]
+        Bug.objects.filter(pk=low.pk).update(assigned_to=self.other)
+        self.assertEqual(self.queue(self.other), [low.id])
+        self.assertNotIn(low.id, self.queue(self.user))
+
+        Bug.objects.filter(status="Open", priority="Critical").update(status="Resolved")
+        self.assertEqual(len(self.queue(self.user)), 2)
+        Bug.objects.filter(pk=critical.pk).update(status="Open", priority="Low")
+        self.assertEqual(self.queue(self.user)[-1], critical.id)
+
+    def test_project_pending_deletion_leaves_queues(self):
+        schedule_project_deletion(self.project, self.user)
+        self.assertEqual(self.queue(self.user), [])
+        bug = Bug.all_objects.get(pk=self.bugs[0].pk)
+        bug.title = "Edited during deletion"
+        bug.save()
+        Bug.all_objects.filter(pk=self.bugs[1].pk).update(assigned_to=self.other)
+        self.assertFalse(WorkQueueEntry.objects.exists())
+
+
+def bug_update(bug_id, version, **changes):
+    return {
+        "type": "bug_update",
+        "bug_id": bug_id,
+        "version": version,
+        "changes": changes,
+    }
+
+
+def typing(user, bug_id):
+    return {"type": "typing_indicator", "user": user, "bug_id": bug_id}
+
+
+class OutboxTests(SimpleTestCase):
+    policies = ["coalesce", "drop_typing", "disconnect"]
+
+    def queued(self, outbox):
+        return [payload for payload, _ in outbox._items.values()]
+
+    def test_keeps_order_below_capacity(self):
+        outbox = Outbox(10, self.policies)
+        events = [bug_update(1, 2, status="Open"), typing("sam", 1)]
+        events.append(bug_update(1, 3, title="T"))
+        for event in events:
+            self.assertIsNone(outbox.put(event))
+        self.assertEqual(self.queued(outbox), events)
+
+    def test_coalesces_only_when_full_and_at_the_back(self):
+        outbox = Outbox(3, self.policies)
+        outbox.put(bug_update(1, 2, status="Open"), "e1")
+        outbox.put({"type": "comment_added", "bug_id": 1}, "e2")
+        outbox.put(bug_update(2, 5, status="Open"), "e3")
+
+        self.assertEqual(outbox.put(bug_update(1, 3, title="T"), "e4"), "coalesced")
+        queued = list(outbox._items.values())
+        self.assertEqual([event_id for _, event_id in queued], ["e2", "e3", None])
+        merged = queued[-1][0]
+        self.assertEqual((merged["version"], merged["base_version"]), (3, 1))
+        self.assertEqual(merged["changes"], {"status": "Open", "title": "T"})
+
+    def test_drops_typing_then_disconnects(self):
+        outbox = Outbox(2, self.policies)
+        outbox.put(typing("sam", 1))
+        outbox.put({"type": "comment_added", "bug_id": 1})
+        self.assertEqual(outbox.put({"type": "comment_added", "bug_id": 2}), "typing")
+        with self.assertRaises(OutboxOverflow):
+            outbox.put({"type": "comment_added", "bug_id": 3})
+
+    def test_drops_oldest_without_policies(self):
+        outbox = Outbox(1, [])
+        outbox.put({"type": "comment_added", "bug_id": 1})
+        self.assertEqual(outbox.put({"type": "comment_added", "bug_id": 2}), "oldest")
+        self.assertEqual(self.queued(outbox), [{"type": "comment_added", "bug_id": 2}])
+
+
+class SendWindowTests(SimpleTestCase):
+    def drain(self, window, count):
+        """Queues ``count`` events of 100 bytes; returns how many were sent."""
+        sent = []
+
+        async def send(payload, event_id):
+            sent.append(payload)
+            window.record(100)
+
+        async def run():
+            outbox = Outbox(10, [])
+            for i in range(count):
+                outbox.put({"type": "comment_added", "bug_id": i})
+            writer = asyncio.create_task(outbox.drain(send, window))
+            await asyncio.sleep(0.01)
+            writer.cancel()
+
+        async_to_sync(run)()
+        return len(sent)
+
+    def test_not_enforced_until_the_client_acknowledges(self):
+        window = SendWindow(200)
+        self.assertEqual(self.drain(window, 5), 5)
+        self.assertEqual(window.in_flight, 500)
+
+    def test_closes_until_acknowledged(self):
+        window = SendWindow(200)
+        window.ack(window.probe())
+        self.assertEqual(self.drain(window, 5), 2)
+
+        first = window.probe()
+        window.ack(first)
+        self.assertEqual(window.in_flight, 0)
+        self.assertEqual(self.drain(window, 5), 2)
+
+        second = window.probe()
+        # A late pong for an older ping doesn't reopen it
+        window.ack(first)
+        self.assertEqual(self.drain(window, 1), 0)
+        window.ack(second)
+        self.assertEqual(self.drain(window, 3), 2)
+
+    def test_probes_before_the_window_fills(self):
+        window = SendWindow(400)
+        self.assertFalse(window.needs_probe())
+        window.record(100)
+        self.assertTrue(window.needs_probe())
+        window.probe()
+        self.assertFalse(window.needs_probe())
@@ -0,0 +1,114 @@
+"""
+Per-user queues of open assigned bugs behind /api/bugs/work_queue/.
+
+Every assigned bug that isn't resolved, deleted or in a project pending
+deletion has a WorkQueueEntry, updated when the bug is saved or changed with
+QuerySet.update() (see BugQuerySet). Entries sort by ``sort_key``, which puts the priority
+rank ahead of the creation time in one integer: most urgent first, oldest
+first within a priority. A page of a user's queue is then a range scan on
+(user, sort_key), however many projects the bugs are spread across.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .models import Bug, WorkQueueEntry
+
+PRIORITY_RANKS = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+CLOSED_STATUSES = {"Resolved"}
+# Bug fields an entry depends on
+QUEUE_FIELDS = {"assigned_to", "status", "priority", "project", "deleted_at"}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Microseconds per priority rank; creation times stay below it until 2286
+_RANK_SPAN = 10**16
+
+
+def sort_key(priority, created_at):
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    return PRIORITY_RANKS.get(priority, len(PRIORITY_RANKS)) * _RANK_SPAN + micros
+
+
+def in_queue(bug):
+    return (
+        bug.assigned_to_id is not None
+        and bug.status not in CLOSED_STATUSES
+        and bug.deleted_at is None
+        and bug.project.deleted_at is None
+    )
+
+
+def entry_for(bug):
+    return WorkQueueEntry(
+        bug_id=bug.pk,
+        user_id=bug.assigned_to_id,
+        project_id=bug.project_id,
+        sort_key=sort_key(bug.priority, bug.created_at),
+    )
+
+
+def refresh(bug):
+    """
+    Adds, moves or removes the bug's entry; one query either way, plus one
+    for the project unless it's already loaded.
+    """
+    if in_queue(bug):
+        WorkQueueEntry.objects.bulk_create(
+            [entry_for(bug)],
+            update_conflicts=True,
+            unique_fields=["bug"],
+            update_fields=["user", "project", "sort_key"],
+        )
+    else:
+        remove_bugs([bug.pk])
+
+
+def refresh_bugs(bug_ids):
+    """refresh() for many bugs at once, reloading them from the database."""
+    bugs = (
+        Bug.all_objects.filter(id__in=bug_ids)
+        .select_related("project")
+        .only(
+            "assigned_to_id",
+            "status",
+            "priority",
+            "created_at",
+            "deleted_at",
+            "project__deleted_at",
+        )
+    )
+    queued = [bug for bug in bugs if in_queue(bug)]
+    queued_ids = {bug.pk for bug in queued}
+    with transaction.atomic():
+        remove_bugs([bug_id for bug_id in bug_ids if bug_id not in queued_ids])
+        WorkQueueEntry.objects.bulk_create(
+            [entry_for(bug) for bug in queued],
+            update_conflicts=True,
+            unique_fields=["bug"],
+            update_fields=["user", "project", "sort_key"],
+        )
+
+
+def remove_bugs(bug_ids):
+    WorkQueueEntry.objects.filter(bug_id__in=bug_ids).delete()
+
+
+def remove_project(project_id):
+    WorkQueueEntry.objects.filter(project_id=project_id).delete()
+
+
+def bug_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Fixtures load bugs before their related rows; the migration backfill
+    # and the next save build the entry instead
+    if raw:
+        return
+    if update_fields is None or QUEUE_FIELDS.intersection(update_fields):
+        refresh(instance)
+
+
+def connect_signals():
+    post_save.connect(
+        bug_saved, sender=Bug, dispatch_uid="tracker.work_queue.bug_saved"
+    )